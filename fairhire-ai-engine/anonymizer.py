@@ -2,38 +2,177 @@
 PII masking and anonymization using Microsoft Presidio
 """
 import logging
-from typing import Dict, List, Any, Optional
+from bisect import bisect_left
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
 import re
+import spacy
 import config
+from section_extractor import section_extractor
+from utils import iter_chunks
 
 logger = logging.getLogger(__name__)
 
+# Regex fallback recognizers, compiled once from config.PATTERNS: (entity type, pattern, score)
+REGEX_RECOGNIZERS = [
+    ('EMAIL_ADDRESS', re.compile(config.PATTERNS['email']), 1.0),
+    ('PHONE_NUMBER', re.compile(config.PATTERNS['phone']), 1.0),
+    ('PERSON', re.compile(config.PATTERNS['full_name']), 0.8),
+]
+
+# Reversible placeholders written by PIIAnonymizer.pseudonymize, e.g. <EMAIL_ADDRESS_1>
+PLACEHOLDER_PATTERN = re.compile(r'<[A-Z_]+_\d+>')
+
+# Parsed resume fields holding PII, at the top level (LLM/hybrid schema) or under contact_info
+PII_FIELDS = ['name', 'email', 'phone']
+
+
+def build_nlp_engine(regex_only: bool = False):
+    """
+    Presidio NLP engine that borrows a pipeline instead of loading its own
+
+    Presidio's default engine loads a second spaCy model next to the one
+    SectionExtractor uses. This engine resolves SectionExtractor's pipeline
+    on first use, or a blank tokenizer-only pipeline when regex_only is set.
+
+    Args:
+        regex_only: Tokenize only; for recognizers that don't need NER
+
+    Returns:
+        A SpacyNlpEngine subclass instance
+    """
+    from presidio_analyzer.nlp_engine import SpacyNlpEngine
+
+    class SharedSpacyNlpEngine(SpacyNlpEngine):
+        def __init__(self):
+            # SpacyNlpEngine.__init__ would spacy.load() a model of its own
+            self._blank_nlp = None
+
+        @property
+        def nlp(self):
+            if not regex_only:
+                return {'en': section_extractor.nlp}
+            if self._blank_nlp is None:
+                self._blank_nlp = spacy.blank('en')
+            return {'en': self._blank_nlp}
+
+    return SharedSpacyNlpEngine()
+
+
+def find_pii_spans(text: str) -> List[Dict[str, Any]]:
+    """
+    Find PII with the regex recognizers, keeping only non-overlapping spans
+
+    Args:
+        text: Input text to analyze
+
+    Returns:
+        List of detected entities in text order
+    """
+    return resolve_overlaps([
+        {
+            'entity_type': entity_type,
+            'start': match.start(),
+            'end': match.end(),
+            'score': score,
+            'text': match.group()
+        }
+        for entity_type, pattern, score in REGEX_RECOGNIZERS
+        for match in pattern.finditer(text)
+    ])
+
+
+def resolve_overlaps(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop overlapping spans, keeping the higher-scoring and then the longer one; returns text order"""
+    candidates = sorted(spans, key=lambda span: (-span['score'], span['start'] - span['end'], span['start']))
+
+    starts, kept = [], []
+    for span in candidates:
+        index = bisect_left(starts, span['start'])
+        if index > 0 and kept[index - 1]['end'] > span['start']:
+            continue
+        if index < len(kept) and kept[index]['start'] < span['end']:
+            continue
+        starts.insert(index, span['start'])
+        kept.insert(index, span)
+    return kept
+
+
+def restore_placeholders(value: Any, mapping: Dict[str, str]) -> Any:
+    """Put original values back in place of placeholders, through nested dicts and lists"""
+    if not mapping:
+        return value
+    if isinstance(value, str):
+        return PLACEHOLDER_PATTERN.sub(lambda match: mapping.get(match.group(0), match.group(0)), value)
+    if isinstance(value, list):
+        return [restore_placeholders(item, mapping) for item in value]
+    if isinstance(value, dict):
+        return {key: restore_placeholders(item, mapping) for key, item in value.items()}
+    return value
+
+
+def mask_value(entity_type: str, value: str, mask_char: str = "*") -> str:
+    """Mask a detected value, keeping enough of its shape to stay readable"""
+    if entity_type == 'EMAIL_ADDRESS':
+        return value[:2] + mask_char * 5 + value[value.rfind('.'):]
+    if entity_type == 'PERSON':
+        # Keep first letter of first name and last name
+        parts = value.split()
+        return " ".join(part[0] + mask_char * (len(part) - 1) for part in parts[:2])
+    return mask_char * len(value)
+
 
 class PIIAnonymizer:
-    def __init__(self):
+    def __init__(self, regex_only: bool = None):
         self.entities = config.PRESIDIO_ENTITIES
+        self.regex_only = config.PRESIDIO_REGEX_ONLY if regex_only is None else regex_only
         self.analyzer = None
+        self.batch_analyzer = None
         self.anonymizer = None
         self.load_presidio()
 
     def load_presidio(self):
         """Load Presidio analyzer and anonymizer"""
         try:
-            from presidio_analyzer import AnalyzerEngine
+            from presidio_analyzer import (AnalyzerEngine, BatchAnalyzerEngine, Pattern,
+                                           PatternRecognizer, RecognizerRegistry)
+            from presidio_analyzer.predefined_recognizers import SpacyRecognizer
             from presidio_anonymizer import AnonymizerEngine
 
-            self.analyzer = AnalyzerEngine()
+            # Only keep recognizers for the configured entities; the rest would run on every text
+            registry = RecognizerRegistry()
+            registry.load_predefined_recognizers(languages=['en'])
+            registry.recognizers = [
+                recognizer for recognizer in registry.recognizers
+                if set(recognizer.supported_entities) & set(self.entities)
+                and not (self.regex_only and isinstance(recognizer, SpacyRecognizer))
+            ]
+            if self.regex_only and 'PERSON' in self.entities:
+                registry.add_recognizer(PatternRecognizer(
+                    supported_entity='PERSON',
+                    patterns=[Pattern('full_name', config.PATTERNS['full_name'], 0.8)]
+                ))
+
+            self.analyzer = AnalyzerEngine(
+                registry=registry,
+                nlp_engine=build_nlp_engine(self.regex_only),
+                supported_languages=['en']
+            )
+            self.batch_analyzer = BatchAnalyzerEngine(analyzer_engine=self.analyzer)
             self.anonymizer = AnonymizerEngine()
 
-            logger.info("Successfully loaded Presidio for PII detection")
+            logger.info(f"Successfully loaded Presidio for PII detection "
+                        f"({len(registry.recognizers)} recognizers for {self.entities}, "
+                        f"{'regex only' if self.regex_only else 'shared spaCy NER'})")
 
         except ImportError:
             logger.warning("Presidio not installed. Install with: pip install presidio-analyzer presidio-anonymizer")
             self.analyzer = None
+            self.batch_analyzer = None
             self.anonymizer = None
         except Exception as e:
             logger.error(f"Error loading Presidio: {e}")
             self.analyzer = None
+            self.batch_analyzer = None
             self.anonymizer = None
 
     def anonymize_text(self, text: str, mask_char: str = "*") -> Dict[str, Any]:
@@ -59,30 +198,66 @@ class PIIAnonymizer:
                 language='en'
             )
 
-            # Anonymize detected entities
-            anonymized_result = self.anonymizer.anonymize(
-                text=text,
-                analyzer_results=results,
-                operators={"DEFAULT": {"type": "mask", "masking_char": mask_char, "chars_to_mask": 5}}
-            )
-
-            return {
-                'anonymized_text': anonymized_result.text,
-                'detected_entities': [
-                    {
-                        'entity_type': result.entity_type,
-                        'start': result.start,
-                        'end': result.end,
-                        'score': result.score
-                    }
-                    for result in results
-                ]
-            }
+            return self._presidio_anonymize(text, results, mask_char)
 
         except Exception as e:
             logger.error(f"Error in Presidio anonymization: {e}")
             return self._regex_anonymize(text, mask_char)
 
+    def anonymize_texts(self, texts: List[str], mask_char: str = "*") -> List[Dict[str, Any]]:
+        """
+        Anonymize PII in many texts with a single batched analysis
+
+        Args:
+            texts: Input texts to anonymize
+            mask_char: Character to use for masking
+
+        Returns:
+            One anonymize_text result per text, in input order
+        """
+        if not self.batch_analyzer or not self.anonymizer:
+            return [self._regex_anonymize(text, mask_char) for text in texts]
+
+        try:
+            # One nlp.pipe pass over all texts instead of one NLP run per text
+            all_results = self.batch_analyzer.analyze_iterator(
+                texts=texts,
+                language='en',
+                entities=self.entities
+            )
+            return [
+                self._presidio_anonymize(text, results, mask_char)
+                for text, results in zip(texts, all_results)
+            ]
+
+        except Exception as e:
+            logger.error(f"Error in batched Presidio anonymization: {e}")
+            return [self._regex_anonymize(text, mask_char) for text in texts]
+
+    def _presidio_anonymize(self, text: str, results, mask_char: str = "*") -> Dict[str, Any]:
+        """Mask the entities Presidio found in text"""
+        from presidio_anonymizer.entities import OperatorConfig
+
+        anonymized_result = self.anonymizer.anonymize(
+            text=text,
+            analyzer_results=results,
+            operators={"DEFAULT": OperatorConfig("mask", {"masking_char": mask_char, "chars_to_mask": 5,
+                                                          "from_end": False})}
+        )
+
+        return {
+            'anonymized_text': anonymized_result.text,
+            'detected_entities': [
+                {
+                    'entity_type': result.entity_type,
+                    'start': result.start,
+                    'end': result.end,
+                    'score': result.score
+                }
+                for result in results
+            ]
+        }
+
     def _regex_anonymize(self, text: str, mask_char: str = "*") -> Dict[str, Any]:
         """
         Fallback regex-based anonymization
@@ -94,60 +269,89 @@ class PIIAnonymizer:
         Returns:
             Dictionary with anonymized text and detected entities
         """
-        anonymized_text = text
-        detected_entities = []
-
-        # Email addresses
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        emails = re.finditer(email_pattern, text)
-        for match in emails:
-            email = match.group()
-            masked_email = email[:2] + mask_char * 5 + email[email.rfind('.'):]
-            anonymized_text = anonymized_text.replace(email, masked_email)
-            detected_entities.append({
-                'entity_type': 'EMAIL_ADDRESS',
-                'start': match.start(),
-                'end': match.end(),
-                'score': 1.0
-            })
-
-        # Phone numbers
-        phone_pattern = r'(\+\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}'
-        phones = re.finditer(phone_pattern, text)
-        for match in phones:
-            phone = match.group()
-            masked_phone = mask_char * len(phone)
-            anonymized_text = anonymized_text.replace(phone, masked_phone)
-            detected_entities.append({
-                'entity_type': 'PHONE_NUMBER',
-                'start': match.start(),
-                'end': match.end(),
-                'score': 1.0
-            })
-
-        # Names (simple pattern - first word in each line that looks like a name)
-        name_pattern = r'\b[A-Z][a-z]+\s+[A-Z][a-z]+\b'
-        names = re.finditer(name_pattern, text)
-        for match in names:
-            name = match.group()
-            # Keep first letter of first name and last name
-            parts = name.split()
-            if len(parts) >= 2:
-                masked_name = parts[0][0] + mask_char * (len(parts[0]) - 1) + " " + parts[1][0] + mask_char * (
-                            len(parts[1]) - 1)
-                anonymized_text = anonymized_text.replace(name, masked_name)
-                detected_entities.append({
-                    'entity_type': 'PERSON',
-                    'start': match.start(),
-                    'end': match.end(),
-                    'score': 0.8
-                })
+        spans = find_pii_spans(text)
+
+        # Build the output in one pass over the spans
+        pieces = []
+        position = 0
+        for span in spans:
+            pieces.append(text[position:span['start']])
+            pieces.append(mask_value(span['entity_type'], span['text'], mask_char))
+            position = span['end']
+        pieces.append(text[position:])
 
         return {
-            'anonymized_text': anonymized_text,
-            'detected_entities': detected_entities
+            'anonymized_text': "".join(pieces),
+            'detected_entities': [
+                {key: span[key] for key in ('entity_type', 'start', 'end', 'score')}
+                for span in spans
+            ]
         }
 
+    def pseudonymize(self, text: str, chunk_chars: int = None) -> Tuple[str, Dict[str, str]]:
+        """
+        Replace PII with reversible placeholders such as <EMAIL_ADDRESS_1>
+
+        The same value always gets the same placeholder, so the text stays
+        coherent for the LLM. Undo with restore_placeholders.
+
+        Args:
+            text: Input text to pseudonymize
+            chunk_chars: Chunk size (default config.PII_CHUNK_CHARS)
+
+        Returns:
+            Tuple of (pseudonymized text, mapping of placeholder to original value)
+        """
+        mapping: Dict[str, str] = {}
+        chunks = iter_chunks(text, chunk_chars or config.PII_CHUNK_CHARS, overlap=0, separator='\n')
+        return "".join(self.pseudonymize_chunks(chunks, mapping)), mapping
+
+    def pseudonymize_chunks(self, chunks: Iterable[str], mapping: Dict[str, str]) -> Iterator[str]:
+        """
+        Pseudonymize a stream of text chunks, one chunk at a time
+
+        Args:
+            chunks: Consecutive pieces of one text
+            mapping: Placeholder to original value, extended as new values are seen
+
+        Yields:
+            Each chunk with its PII replaced
+        """
+        placeholders = {value: placeholder for placeholder, value in mapping.items()}
+        counts: Dict[str, int] = {}
+        for placeholder in mapping:
+            entity_type = placeholder[1:placeholder.rindex('_')]
+            counts[entity_type] = counts.get(entity_type, 0) + 1
+
+        # Without NER, "First Last" also matches "Computer Science"; only the header name is replaced
+        ner_names = self.analyzer is not None and not self.regex_only
+        header_name = None
+
+        for index, chunk in enumerate(chunks):
+            if index == 0 and not ner_names:
+                header_name = section_extractor.extract_name_from_header(chunk)
+
+            spans = resolve_overlaps([
+                span for span in self.detect_pii_entities(chunk)
+                if span['entity_type'] != 'PERSON' or ner_names or span['text'] == header_name
+            ])
+
+            pieces = []
+            position = 0
+            for span in spans:
+                value = span['text']
+                if value not in placeholders:
+                    entity_type = span['entity_type']
+                    counts[entity_type] = counts.get(entity_type, 0) + 1
+                    placeholder = f"<{entity_type}_{counts[entity_type]}>"
+                    placeholders[value] = placeholder
+                    mapping[placeholder] = value
+                pieces.append(chunk[position:span['start']])
+                pieces.append(placeholders[value])
+                position = span['end']
+            pieces.append(chunk[position:])
+            yield "".join(pieces)
+
     def anonymize_resume(self, resume_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Anonymize PII in resume data
@@ -158,49 +362,48 @@ class PIIAnonymizer:
         Returns:
             Anonymized resume data
         """
-        anonymized_data = resume_data.copy()
+        return self.anonymize_resumes([resume_data])[0]
 
+    def anonymize_resumes(self, resumes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Anonymize PII in many parsed resumes
+
+        The PII fields of every resume are collected and analyzed together
+        in one anonymize_texts call, then written back into copies.
+
+        Args:
+            resumes: Parsed resume data
+
+        Returns:
+            Anonymized copies, in input order
+        """
         try:
-            # Anonymize contact information
-            if 'contact_info' in anonymized_data:
-                contact_info = anonymized_data['contact_info']
-
-                # Mask name
-                if contact_info.get('name'):
-                    name_result = self.anonymize_text(contact_info['name'])
-                    anonymized_data['contact_info']['name'] = name_result['anonymized_text']
-
-                # Mask email
-                if contact_info.get('email'):
-                    email_result = self.anonymize_text(contact_info['email'])
-                    anonymized_data['contact_info']['email'] = email_result['anonymized_text']
-
-                # Mask phone
-                if contact_info.get('phone'):
-                    phone_result = self.anonymize_text(contact_info['phone'])
-                    anonymized_data['contact_info']['phone'] = phone_result['anonymized_text']
-
-            # Anonymize experience company names (optional)
-            if 'experience' in anonymized_data:
-                for exp in anonymized_data['experience']:
-                    if exp.get('company'):
-                        # Optionally mask company names
-                        # exp['company'] = self.anonymize_text(exp['company'])['anonymized_text']
-                        pass
-
-            # Anonymize education institution names (optional)
-            if 'education' in anonymized_data:
-                for edu in anonymized_data['education']:
-                    if edu.get('institution'):
-                        # Optionally mask institution names
-                        # edu['institution'] = self.anonymize_text(edu['institution'])['anonymized_text']
-                        pass
-
-            return anonymized_data
+            anonymized = []
+            targets = []
+            values = []
+            for resume_data in resumes:
+                anonymized_data = resume_data.copy()
+                if isinstance(anonymized_data.get('contact_info'), dict):
+                    anonymized_data['contact_info'] = dict(anonymized_data['contact_info'])
+                anonymized.append(anonymized_data)
+
+                # Company and institution names are left as they are
+                for container in (anonymized_data, anonymized_data.get('contact_info')):
+                    if not isinstance(container, dict):
+                        continue
+                    for field in PII_FIELDS:
+                        if isinstance(container.get(field), str) and container[field]:
+                            targets.append((container, field))
+                            values.append(container[field])
+
+            for (container, field), result in zip(targets, self.anonymize_texts(values)):
+                container[field] = result['anonymized_text']
+
+            return anonymized
 
         except Exception as e:
-            logger.error(f"Error anonymizing resume: {e}")
-            return resume_data
+            logger.error(f"Error anonymizing resumes: {e}")
+            return resumes
 
     def detect_pii_entities(self, text: str) -> List[Dict[str, Any]]:
         """
@@ -239,42 +442,7 @@ class PIIAnonymizer:
 
     def _regex_detect_pii(self, text: str) -> List[Dict[str, Any]]:
         """Fallback regex-based PII detection"""
-        entities = []
-
-        # Email addresses
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        for match in re.finditer(email_pattern, text):
-            entities.append({
-                'entity_type': 'EMAIL_ADDRESS',
-                'start': match.start(),
-                'end': match.end(),
-                'score': 1.0,
-                'text': match.group()
-            })
-
-        # Phone numbers
-        phone_pattern = r'(\+\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}'
-        for match in re.finditer(phone_pattern, text):
-            entities.append({
-                'entity_type': 'PHONE_NUMBER',
-                'start': match.start(),
-                'end': match.end(),
-                'score': 1.0,
-                'text': match.group()
-            })
-
-        # Names
-        name_pattern = r'\b[A-Z][a-z]+\s+[A-Z][a-z]+\b'
-        for match in re.finditer(name_pattern, text):
-            entities.append({
-                'entity_type': 'PERSON',
-                'start': match.start(),
-                'end': match.end(),
-                'score': 0.8,
-                'text': match.group()
-            })
-
-        return entities
+        return find_pii_spans(text)
 
     def get_anonymization_stats(self, text: str) -> Dict[str, Any]:
         """
@@ -0,0 +1,249 @@
+"""
+Micro-benchmarks for the AI engine's hot paths
+
+Usage:
+    python benchmark.py pdf [files...]
+    python benchmark.py sections [--count N] [files...]
+    python benchmark.py anonymize [--pages N ...]
+    python benchmark.py normalize [--count N]
+    python benchmark.py embed [--count N]
+"""
+import argparse
+import glob
+import os
+import random
+import re
+import statistics
+import unicodedata
+import sys
+import time
+from typing import Callable, List
+
+import config
+
+# Local sample corpus: the engine's own upload folder plus the backend's uploads
+DEFAULT_PDF_CORPUS = [
+    os.path.join(config.UPLOAD_DIR, "*.pdf"),
+    os.path.join("..", "backend", "uploads", "*.pdf"),
+]
+
+
+def time_call(func: Callable, repeat: int) -> float:
+    """Median wall time of func() in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def collect_files(patterns: List[str]) -> List[str]:
+    files = []
+    for pattern in patterns:
+        files.extend(sorted(glob.glob(pattern)) if any(c in pattern for c in "*?[") else [pattern])
+    return [f for f in files if os.path.isfile(f)]
+
+
+def bench_pdf(args):
+    from parse_pdf import PDF_EXTRACTORS, text_quality, is_garbled
+
+    files = collect_files(args.files or DEFAULT_PDF_CORPUS)
+    if not files:
+        print("No PDF files found")
+        return
+
+    print(f"{len(files)} files, median of {args.repeat} runs\n")
+    print(f"{'backend':<12}{'total ms':>10}{'ms/file':>10}{'chars':>10}{'quality':>10}{'garbled':>9}")
+
+    for name, extractor in PDF_EXTRACTORS.items():
+        if not extractor.available():
+            print(f"{name:<12}{'not installed':>49}")
+            continue
+
+        total_ms, chars, qualities, garbled = 0.0, 0, [], 0
+        for path in files:
+            try:
+                total_ms += time_call(lambda: extractor.extract_pages(path), args.repeat)
+                text = "\n".join(extractor.extract_pages(path))
+            except Exception:
+                garbled += 1
+                continue
+            chars += len(text)
+            qualities.append(text_quality(text))
+            garbled += is_garbled(text)
+
+        quality = statistics.mean(qualities) if qualities else 0.0
+        print(f"{name:<12}{total_ms:>10.1f}{total_ms / len(files):>10.1f}{chars:>10}{quality:>10.3f}{garbled:>9}")
+
+
+SYNTHETIC_SKILLS = ['Python', 'Django', 'React', 'Node.js', 'AWS', 'Docker', 'Kubernetes',
+                    'PostgreSQL', 'MongoDB', 'Machine Learning', 'TensorFlow', 'Git', 'Agile']
+
+
+def synthetic_resume(seed: int) -> str:
+    """Deterministic resume-shaped text for benchmarks that need a large corpus"""
+    rng = random.Random(seed)
+    first, last = rng.choice(['Asha', 'Daniel', 'Mei', 'Omar', 'Lucia']), rng.choice(['Rao', 'Okafor', 'Chen', 'Novak'])
+    # Every fourth resume opens with a lowercase header line so the spaCy fallback is exercised
+    header = f"{first} {last}" if seed % 4 else f"resume of {first.lower()} {last.lower()}"
+    skills = ", ".join(rng.sample(SYNTHETIC_SKILLS, 6))
+    return (
+        f"{header}\n{first.lower()}.{last.lower()}{seed}@example.com | +91 98{seed % 100000000:08d}\n"
+        f"linkedin.com/in/{first.lower()}{seed}\n\n"
+        f"Summary\nBackend engineer with {rng.randint(1, 12)} years of experience building APIs.\n\n"
+        f"Technical Skills\n- {skills}\n\n"
+        f"Experience\nSoftware Engineer at Company{seed % 50} ({2015 + seed % 8} - Present)\n"
+        f"- Built services in {rng.choice(SYNTHETIC_SKILLS)}\n\n"
+        f"Education\nBachelor of Technology in Computer Science, {2010 + seed % 10}\n\n"
+        f"Certifications\n- AWS Certified Developer\n\n"
+        f"Languages\nEnglish, Hindi\n"
+    )
+
+
+def load_texts(patterns: List[str], count: int) -> List[str]:
+    """Text files from patterns, cycled up to count, or a synthetic corpus"""
+    texts = []
+    for path in collect_files(patterns):
+        with open(path, encoding='utf-8', errors='ignore') as file:
+            texts.append(file.read())
+    if not texts:
+        return [synthetic_resume(seed) for seed in range(count)]
+    return [texts[i % len(texts)] for i in range(count)]
+
+
+def bench_sections(args):
+    from section_extractor import section_extractor, get_section_pool
+
+    texts = load_texts(args.files, args.count)
+    print(f"{len(texts)} resumes, median of {args.repeat} runs\n")
+
+    # Load models outside the timed region: the serial model here, the workers' in their initializer
+    section_extractor.nlp
+    list(get_section_pool().map(abs, range(config.SECTION_WORKERS)))
+
+    serial_ms = time_call(lambda: section_extractor.extract_all_sections_batch(texts), args.repeat)
+    pooled_ms = time_call(lambda: section_extractor.extract_many(texts), args.repeat)
+    same = section_extractor.extract_all_sections_batch(texts) == section_extractor.extract_many(texts)
+
+    print(f"{'path':<28}{'total ms':>10}{'resumes/s':>12}")
+    print(f"{'serial':<28}{serial_ms:>10.1f}{len(texts) / serial_ms * 1000:>12.0f}")
+    label = f"extract_many ({config.SECTION_WORKERS} workers)"
+    print(f"{label:<28}{pooled_ms:>10.1f}{len(texts) / pooled_ms * 1000:>12.0f}")
+    print(f"\nspeedup {serial_ms / pooled_ms:.2f}x, identical results: {same}")
+
+
+def bench_anonymize(args):
+    from anonymizer import pii_anonymizer
+
+    print(f"Regex anonymizer on multi-page synthetic resumes, median of {args.repeat} runs\n")
+    print(f"{'pages':>6}{'chars':>10}{'entities':>10}{'ms':>10}{'us/kchar':>10}")
+
+    for pages in args.pages:
+        # Roughly one resume per page
+        text = "\n\n".join(synthetic_resume(seed) for seed in range(pages))
+        elapsed_ms = time_call(lambda: pii_anonymizer._regex_anonymize(text), args.repeat)
+        entities = len(pii_anonymizer._regex_anonymize(text)['detected_entities'])
+        print(f"{pages:>6}{len(text):>10}{entities:>10}{elapsed_ms:>10.2f}{elapsed_ms * 1e6 / len(text):>10.1f}")
+
+
+def legacy_clean_text(text: str) -> str:
+    """utils.clean_text before precompiled patterns, kept as the benchmark baseline"""
+    if not text:
+        return ""
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^\w\s\-.,!?@]', '', text)
+    text = unicodedata.normalize('NFKD', text)
+    return text.strip()
+
+
+def legacy_normalize_skill(skill: str, synonym_dict) -> str:
+    if not skill:
+        return ""
+    normalized = legacy_clean_text(skill.lower())
+    return synonym_dict.get(normalized, normalized)
+
+
+def bench_normalize(args):
+    from utils import clean_text, normalize_skill, normalize_skills
+
+    # Skill tokens as extract_skills sees them: known terms plus noisy bullet fragments
+    rng = random.Random(0)
+    vocabulary = list(config.SKILL_TAXONOMY) + list(config.SKILL_SYNONYMS)
+    noise = ['  React.js ', 'Node.JS;', 'C++ (advanced)', 'Machine  Learning!', 'Écoute active', '•  Docker']
+    skills = [rng.choice(vocabulary + noise) for _ in range(args.count)]
+    bullets = [synthetic_resume(seed) for seed in range(200)]
+
+    assert [legacy_clean_text(text) for text in bullets] == [clean_text(text) for text in bullets]
+    assert [legacy_normalize_skill(s, config.SKILL_SYNONYMS) for s in skills] == \
+           [normalize_skill(s, config.SKILL_SYNONYMS) for s in skills]
+
+    synonyms = config.SKILL_SYNONYMS
+    rows = [
+        ('clean_text x200 resumes, legacy', lambda: [legacy_clean_text(text) for text in bullets]),
+        ('clean_text x200 resumes', lambda: [clean_text(text) for text in bullets]),
+        (f'normalize_skill x{len(skills)}, legacy', lambda: [legacy_normalize_skill(s, synonyms) for s in skills]),
+        (f'normalize_skill x{len(skills)}', lambda: [normalize_skill(s, synonyms) for s in skills]),
+        (f'normalize_skills x{len(skills)}', lambda: normalize_skills(skills, synonyms)),
+    ]
+
+    print(f"median of {args.repeat} runs, outputs checked against legacy\n")
+    print(f"{'function':<40}{'ms':>10}")
+    for label, func in rows:
+        print(f"{label:<40}{time_call(func, args.repeat):>10.2f}")
+
+
+def bench_embed(args):
+    from embedding import embedding_generator, get_encoder_pool, shutdown_encoder_pool
+
+    texts = [synthetic_resume(seed) for seed in range(args.count)]
+    print(f"{len(texts)} resumes, median of {args.repeat} runs\n")
+
+    # Start the workers (and load their models) outside the timed region
+    list(get_encoder_pool().map(abs, range(config.EMBEDDING_WORKERS)))
+    try:
+        serial_ms = time_call(lambda: embedding_generator.encode_batch(texts), args.repeat)
+        pooled_ms = time_call(lambda: embedding_generator.encode_many(texts), args.repeat)
+    finally:
+        shutdown_encoder_pool()
+
+    print(f"{'path':<36}{'total ms':>10}{'texts/s':>10}")
+    print(f"{'encode_batch':<36}{serial_ms:>10.1f}{len(texts) / serial_ms * 1000:>10.0f}")
+    label = f"encode_many ({config.EMBEDDING_WORKERS}x{config.EMBEDDING_THREADS_PER_WORKER} threads)"
+    print(f"{label:<36}{pooled_ms:>10.1f}{len(texts) / pooled_ms * 1000:>10.0f}")
+    print(f"\nspeedup {serial_ms / pooled_ms:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FairHireQuest AI Engine benchmarks')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    pdf_parser = subparsers.add_parser('pdf', help='PDF extraction backends: latency and text quality')
+    pdf_parser.add_argument('files', nargs='*', help='PDF files or glob patterns (default: local upload corpus)')
+    pdf_parser.set_defaults(func=bench_pdf)
+
+    sections_parser = subparsers.add_parser('sections', help='SectionExtractor: serial vs process pool')
+    sections_parser.add_argument('--count', type=int, default=10000, help='Number of resumes')
+    sections_parser.add_argument('files', nargs='*', help='Resume text files (default: synthetic corpus)')
+    sections_parser.set_defaults(func=bench_sections)
+
+    anonymize_parser = subparsers.add_parser('anonymize', help='Regex PII anonymizer scaling with resume length')
+    anonymize_parser.add_argument('--pages', type=int, nargs='+', default=[1, 5, 20, 100],
+                                  help='Resume lengths to measure, in pages')
+    anonymize_parser.set_defaults(func=bench_anonymize)
+
+    normalize_parser = subparsers.add_parser('normalize', help='Text and skill normalization vs the legacy functions')
+    normalize_parser.add_argument('--count', type=int, default=50000, help='Number of skill tokens')
+    normalize_parser.set_defaults(func=bench_normalize)
+
+    embed_parser = subparsers.add_parser('embed', help='Embedding: in-process vs CPU encoder pool')
+    embed_parser.add_argument('--count', type=int, default=5000, help='Number of texts')
+    embed_parser.set_defaults(func=bench_embed)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
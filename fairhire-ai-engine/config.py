@@ -12,23 +12,126 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/test")
 DB_NAME = "test"
 
+# Connection Pool Configuration
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
 # Collections
 RESUMES_COLLECTION = "resumes"
 JOBS_COLLECTION = "jobs"
 MATCHES_COLLECTION = "matches"
+JOB_MATCHES_COLLECTION = "job_matches"  # Reverse index: job -> matched resumes
+JOB_MATCHES_MAX_PAGE_SIZE = 100  # Largest page get_matched_resumes_for_job returns
+EXTRACTED_TEXT_COLLECTION = "extracted_texts"  # Compressed PDF text keyed by content hash
+
+# Change Stream Watcher Configuration
+WATCHER_MAX_AWAIT_MS = int(os.getenv("WATCHER_MAX_AWAIT_MS", "500"))
+WATCHER_RETRY_DELAY_SECONDS = 5
+# Job fields written by the engine itself; updates touching only these don't dirty a job
+ENGINE_JOB_FIELDS = {"embedding", "embedding_updated_at", "embedding_dirty"}
 
 # AI Model Configuration
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_CHUNK_OVERLAP = 32  # Tokens repeated between consecutive chunks of long texts
+EMBEDDING_BATCH_SIZE = 32
+# Padded tokens per batch in encode_batch; batches of short texts hold more texts
+EMBEDDING_TOKEN_BUDGET = int(os.getenv("EMBEDDING_TOKEN_BUDGET", "8192"))
+# How chunk vectors of a long text are combined: "mean", or "weighted" by chunk length
+EMBEDDING_POOLING = os.getenv("EMBEDDING_POOLING", "weighted")
+# Also store each resume's per-chunk vectors (chunk_embeddings) next to the pooled one
+EMBEDDING_KEEP_CHUNK_VECTORS = os.getenv("EMBEDDING_KEEP_CHUNK_VECTORS", "false").lower() == "true"
+# Multi-process CPU encoding for bulk re-embeds (EmbeddingGenerator.encode_many)
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Torch intra-op threads per worker; workers x threads should not exceed the cores
+EMBEDDING_THREADS_PER_WORKER = int(os.getenv(
+    "EMBEDDING_THREADS_PER_WORKER", str(max(1, (os.cpu_count() or 1) // EMBEDDING_WORKERS))))
+EMBEDDING_SHARD_SIZE = 256  # Texts per pool task
+EMBEDDING_POOL_MIN_TEXTS = 512  # Smaller inputs are encoded in-process
 SIMILARITY_THRESHOLD = 0.7
 MAX_MATCHES_PER_RESUME = 10
 
+# PDF Extraction Configuration
+# Backends tried in order; later ones only run when earlier output is empty or garbled
+PDF_EXTRACTOR_ORDER = ["pymupdf", "pdfplumber", "pypdf2"]
+PDF_MIN_TEXT_CHARS = 50
+PDF_MIN_TEXT_QUALITY = 0.9
+# Bounds on what is extracted (and later sent to the LLM) from oversized PDFs.
+# The page cap is opt-in: unset (or 0) extracts every page
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "0")) or None
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "20000"))
+
+# OCR Configuration (scanned resumes; needs the tesseract binary)
+OCR_ENABLED = os.getenv("OCR_ENABLED", "true").lower() == "true"
+OCR_LANGUAGE = "eng"
+OCR_DPI = 200
+OCR_PAGE_TIMEOUT = 30  # seconds per page
+OCR_MIN_PAGE_CHARS = 20  # pages with less text than this are treated as scanned
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(min(4, os.cpu_count() or 1))))  # concurrent tesseract processes
+
+# Resume Download Configuration
+HTTP_CONNECT_TIMEOUT = 5
+HTTP_READ_TIMEOUT = 30
+HTTP_POOL_SIZE = 10
+PDF_SPOOL_MAX_BYTES = 8 * 1024 * 1024  # Larger downloads spill to a temp file
+PDF_MAX_DOWNLOAD_BYTES = 25 * 1024 * 1024
+
+# Hybrid Parsing Configuration
+# Parse locally with SectionExtractor; only low-confidence fields go to the LLM
+HYBRID_PARSING_ENABLED = os.getenv("HYBRID_PARSING_ENABLED", "true").lower() == "true"
+HYBRID_CONFIDENCE_THRESHOLD = 0.6
+HYBRID_CONTACT_CHARS = 1500  # Header slice sent when only contact fields are uncertain
+
+# spaCy Configuration
+# Only NER is used (PERSON fallback for names); the other components are never loaded.
+# The shared tok2vec only feeds the tagger and parser: the sm/md models' NER has its own
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+SPACY_EXCLUDE = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "senter"]
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", "64"))
+SPACY_N_PROCESS = int(os.getenv("SPACY_N_PROCESS", "1"))
+SPACY_NAME_CHARS = 500  # Leading slice of the resume searched for a PERSON entity
+
+# Bulk Section Extraction Configuration
+# SectionExtractor.extract_many spreads at least this many resumes across a process pool
+SECTION_PARALLEL_MIN_TEXTS = 32
+SECTION_WORKERS = int(os.getenv("SECTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+SECTION_CHUNK_SIZE = int(os.getenv("SECTION_CHUNK_SIZE", "64"))  # Resumes per pool task
+
 # File Paths
 UPLOAD_DIR = "uploads"
 TEMP_DIR = "temp"
 MODELS_DIR = "models"
+OCR_CACHE_DIR = os.path.join(TEMP_DIR, "ocr_cache")
 
 # Presidio Configuration
 PRESIDIO_ENTITIES = ["PERSON", "EMAIL_ADDRESS", "PHONE_NUMBER", "CREDIT_CARD", "IBAN_CODE"]
+# Skip spaCy NER: texts are only tokenized and PERSON is matched with PATTERNS["full_name"]
+PRESIDIO_REGEX_ONLY = os.getenv("PRESIDIO_REGEX_ONLY", "false").lower() == "true"
+# Replace PII in resume text with reversible placeholders before it is sent to the LLM
+LLM_PII_MASKING = os.getenv("LLM_PII_MASKING", "true").lower() == "true"
+PII_CHUNK_CHARS = 4000  # Text is pseudonymized chunk by chunk, split at line ends
+
+# Skill Taxonomy: terms detected by skill_matcher (merged with SKILL_SYNONYMS aliases)
+SKILL_TAXONOMY = [
+    'python', 'javascript', 'java', 'c++', 'c#', 'php', 'ruby', 'go', 'rust',
+    'react', 'angular', 'vue', 'node.js', 'django', 'flask', 'spring',
+    'html', 'css', 'sass', 'bootstrap', 'tailwind',
+    'mysql', 'postgresql', 'mongodb', 'redis', 'elasticsearch',
+    'aws', 'azure', 'gcp', 'docker', 'kubernetes', 'jenkins',
+    'git', 'github', 'gitlab', 'jira', 'confluence',
+    'machine learning', 'deep learning', 'tensorflow', 'pytorch',
+    'data science', 'pandas', 'numpy', 'scikit-learn',
+    'restful', 'api', 'microservices', 'agile', 'scrum'
+]
+# Optional file extending the taxonomy, one "skill" or "skill: alias, alias" per line
+SKILL_TAXONOMY_FILE = os.getenv("SKILL_TAXONOMY_FILE", "skills_taxonomy.txt")
+# Aliases too ambiguous in resumes to count as skills ("CV" usually means the resume itself)
+SKILL_TERMS_EXCLUDED = ["cv"]
+# Extracted skills at least this similar (0-1, edit-distance ratio) to a taxonomy term are mapped onto it
+SKILL_FUZZY_CUTOFF = 0.9
+SKILL_FUZZY_CACHE_SIZE = 20000
 
 # Skill Synonyms
 SKILL_SYNONYMS = {
@@ -60,6 +163,7 @@ PATTERNS = {
     "linkedin": r'linkedin\.com/in/[A-Za-z0-9-]+',
     "github": r'github\.com/[A-Za-z0-9-]+',
     "name": r'^[A-Z][a-z]+(?: [A-Z][a-z]+)*$',
+    "full_name": r'\b[A-Z][a-z]+\s+[A-Z][a-z]+\b',  # "First Last" anywhere in text (PII fallback)
 }
 
 # Logging Configuration
@@ -1,47 +1,202 @@
 """
 MongoDB database connection and operations
 """
+import hashlib
+import json
 import logging
-from pymongo import MongoClient
+import numbers
+import threading
+from contextlib import contextmanager
+from pymongo import ASCENDING, DESCENDING, DeleteMany, InsertOne
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 from bson import ObjectId
 import config
+from mongo_pool import MongoConnectionPool, mongo_pool
 
 logger = logging.getLogger(__name__)
 
-class DatabaseManager:
+
+class DocumentCache:
+    """
+    Identity map of resume and job documents for a single pipeline run.
+
+    Each document is read from MongoDB at most once while the cache is
+    active; writes made through DatabaseManager are applied to the cached
+    copy so later readers see the same state as the database.
+    """
+
     def __init__(self):
-        self.client = None
-        self.db = None
+        self._docs = {}
+        self._all_jobs = None
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(collection: str, doc_id) -> tuple:
+        return collection, str(doc_id)
+
+    def get(self, collection: str, doc_id) -> Optional[Dict]:
+        with self._lock:
+            doc = self._docs.get(self._key(collection, doc_id))
+            if doc is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return doc
+
+    def put(self, collection: str, doc: Dict) -> Dict:
+        """Store a document, returning the canonical cached instance"""
+        with self._lock:
+            key = self._key(collection, doc["_id"])
+            cached = self._docs.get(key)
+            if cached is not None:
+                return cached
+            self._docs[key] = doc
+            return doc
+
+    def get_all_jobs(self) -> Optional[List[Dict]]:
+        with self._lock:
+            if self._all_jobs is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return list(self._all_jobs)
+
+    def put_all_jobs(self, jobs: List[Dict]) -> List[Dict]:
+        with self._lock:
+            self._all_jobs = [self.put(config.JOBS_COLLECTION, job) for job in jobs]
+            return list(self._all_jobs)
+
+    def apply_update(self, collection: str, doc_id, fields: Dict[str, Any], removed: List[str] = ()):
+        """Mirror a $set (and $unset of removed) update onto the cached document, if present"""
+        with self._lock:
+            doc = self._docs.get(self._key(collection, doc_id))
+            if doc is not None:
+                doc.update(fields)
+                for field in removed:
+                    doc.pop(field, None)
+
+    def invalidate(self, collection: str, doc_id=None):
+        """Drop one document, or a whole collection when doc_id is None"""
+        with self._lock:
+            if doc_id is not None:
+                self._docs.pop(self._key(collection, doc_id), None)
+            else:
+                self._docs = {k: v for k, v in self._docs.items() if k[0] != collection}
+            if collection == config.JOBS_COLLECTION:
+                self._all_jobs = None
+
+    def clear(self):
+        with self._lock:
+            self._docs.clear()
+            self._all_jobs = None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"documents": len(self._docs), "hits": self.hits, "misses": self.misses}
+
+
+class DatabaseManager:
+    def __init__(self, pool: MongoConnectionPool = None):
+        self.pool = pool or mongo_pool
+        self.cache: Optional[DocumentCache] = None
         self.connect()
 
+    @property
+    def client(self):
+        return self.pool.client
+
+    @property
+    def db(self):
+        # Resolved through the pool on every access so forked workers get their own client
+        return self.pool.get_database()
+
+    @property
+    def async_db(self):
+        """Motor database handle for asyncio stages"""
+        return self.pool.get_async_database()
+
     def connect(self):
         """Establish connection to MongoDB"""
         try:
-            self.client = MongoClient(config.MONGODB_URI, serverSelectionTimeoutMS=5000)
-            self.db = self.client[config.DB_NAME]
             self.client.admin.command('ping')
             logger.info("Successfully connected to MongoDB")
         except (ConnectionFailure, ServerSelectionTimeoutError) as e:
             logger.error(f"Failed to connect to MongoDB: {e}")
             raise
+        self.ensure_indexes()
+
+    def ensure_indexes(self):
+        """Create indexes used by match lookups (no-op if they already exist)"""
+        try:
+            self.db[config.MATCHES_COLLECTION].create_index([("resume_id", ASCENDING)])
+            self.db[config.JOB_MATCHES_COLLECTION].create_index(
+                [("job_id", ASCENDING), ("score", DESCENDING), ("resume_id", ASCENDING)]
+            )
+            self.db[config.JOB_MATCHES_COLLECTION].create_index([("resume_id", ASCENDING)])
+        except Exception as e:
+            logger.warning(f"Could not ensure indexes: {e}")
 
     def close(self):
-        if self.client:
-            self.client.close()
-            logger.info("Database connection closed")
+        self.pool.close()
+        logger.info("Database connection closed")
+
+    def get_pool_metrics(self) -> Dict[str, Any]:
+        return self.pool.metrics()
+
+    @contextmanager
+    def run_cache(self):
+        """
+        Activate the per-run document cache for the duration of a block.
+
+        Nested scopes reuse the outer cache, so a batch run and the single
+        resume runs inside it share one identity map.
+        """
+        if self.cache is not None:
+            yield self.cache
+            return
+
+        self.cache = DocumentCache()
+        try:
+            yield self.cache
+        finally:
+            logger.info(f"Document cache stats for run: {self.cache.stats()}")
+            self.cache = None
+
+    def invalidate_cache(self, collection: str, doc_id: str = None):
+        if self.cache is not None:
+            self.cache.invalidate(collection, doc_id)
+
+    def _cache_update(self, collection: str, doc_id: str, fields: Dict[str, Any], removed: List[str] = ()):
+        if self.cache is not None:
+            self.cache.apply_update(collection, doc_id, fields, removed)
 
     # Resume Operations
     def get_pending_resumes(self, limit: int = 100) -> List[Dict]:
         try:
             resumes = self.db[config.RESUMES_COLLECTION].find({"status": "pending"}, limit=limit)
+            if self.cache is not None:
+                return [self.cache.put(config.RESUMES_COLLECTION, resume) for resume in resumes]
             return list(resumes)
         except Exception as e:
             logger.error(f"Error fetching pending resumes: {e}")
             return []
 
+    def get_processed_resumes(self, limit: int = 0) -> List[Dict]:
+        """Processed resumes with their parsed data, for bulk re-embedding"""
+        try:
+            return list(self.db[config.RESUMES_COLLECTION].find(
+                {"status": "processed", "parsed_data": {"$exists": True}},
+                {"parsed_data": 1},
+                limit=limit
+            ))
+        except Exception as e:
+            logger.error(f"Error fetching processed resumes: {e}")
+            return []
+
     def update_resume_status(self, resume_id: str, status: str, parsed_data: Dict = None):
         try:
             update_data = {
@@ -56,6 +211,8 @@ class DatabaseManager:
                 {"$set": update_data}
             )
 
+            self._cache_update(config.RESUMES_COLLECTION, resume_id, update_data)
+
             if result.modified_count > 0:
                 logger.info(f"Resume {resume_id} updated successfully")
             else:
@@ -63,24 +220,75 @@ class DatabaseManager:
 
         except Exception as e:
             logger.error(f"Error updating resume {resume_id}: {e}")
+            self.invalidate_cache(config.RESUMES_COLLECTION, resume_id)
 
     def get_resume_by_id(self, resume_id: str) -> Optional[Dict]:
         try:
-            return self.db[config.RESUMES_COLLECTION].find_one({"_id": ObjectId(resume_id)})
+            if self.cache is not None:
+                cached = self.cache.get(config.RESUMES_COLLECTION, resume_id)
+                if cached is not None:
+                    return cached
+
+            resume = self.db[config.RESUMES_COLLECTION].find_one({"_id": ObjectId(resume_id)})
+            if resume and self.cache is not None:
+                resume = self.cache.put(config.RESUMES_COLLECTION, resume)
+            return resume
         except Exception as e:
             logger.error(f"Error fetching resume {resume_id}: {e}")
             return None
 
-    def save_resume_embedding(self, resume_id: str, embedding: List[float]):
+    def save_resume_embedding(self, resume_id: str, embedding: List[float],
+                              chunk_embeddings: Optional[List[List[float]]] = None):
         try:
+            fields = {"embedding": embedding, "embedding_updated_at": datetime.utcnow()}
+            update = {"$set": fields}
+            removed = []
+            if chunk_embeddings is not None:
+                fields["chunk_embeddings"] = chunk_embeddings
+            else:
+                # Chunk vectors of an earlier embedding don't belong to the new pooled one
+                removed.append("chunk_embeddings")
+                update["$unset"] = {"chunk_embeddings": ""}
             self.db[config.RESUMES_COLLECTION].update_one(
                 {"_id": ObjectId(resume_id)},
-                {"$set": {"embedding": embedding, "embedding_updated_at": datetime.utcnow()}}
+                update
             )
+            self._cache_update(config.RESUMES_COLLECTION, resume_id, fields, removed)
             logger.info(f"Embedding saved for resume {resume_id}")
         except Exception as e:
             logger.error(f"Error saving embedding for resume {resume_id}: {e}")
 
+    def save_resume_file_hash(self, resume_id: str, file_path: str, file_sha256: str):
+        """Remember which PDF content a resume's file_path pointed to"""
+        try:
+            fields = {"file_sha256": file_sha256, "file_sha256_path": file_path}
+            self.db[config.RESUMES_COLLECTION].update_one(
+                {"_id": ObjectId(resume_id)},
+                {"$set": fields}
+            )
+            self._cache_update(config.RESUMES_COLLECTION, resume_id, fields)
+        except Exception as e:
+            logger.error(f"Error saving file hash for resume {resume_id}: {e}")
+
+    # Extracted Text Operations
+    def get_extracted_text(self, cache_key: str) -> Optional[Dict]:
+        try:
+            return self.db[config.EXTRACTED_TEXT_COLLECTION].find_one({"_id": cache_key})
+        except Exception as e:
+            logger.error(f"Error fetching extracted text {cache_key}: {e}")
+            return None
+
+    def save_extracted_text(self, cache_key: str, document: Dict[str, Any]):
+        try:
+            document = dict(document, created_at=datetime.utcnow())
+            self.db[config.EXTRACTED_TEXT_COLLECTION].update_one(
+                {"_id": cache_key},
+                {"$setOnInsert": document},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Error saving extracted text {cache_key}: {e}")
+
     # Job Operations
     # def get_all_jobs(self) -> List[Dict]:
     #     try:
@@ -89,7 +297,17 @@ class DatabaseManager:
     #
     def get_jobs_without_embedding(self) -> List[Dict[str, Any]]:
         try:
-            jobs = self.db[config.JOBS_COLLECTION].find({"embedding": {"$exists": False}})
+            if self.cache is not None:
+                cached_jobs = self.cache.get_all_jobs()
+                if cached_jobs is not None:
+                    return [job for job in cached_jobs
+                            if "embedding" not in job or job.get("embedding_dirty")]
+
+            jobs = self.db[config.JOBS_COLLECTION].find({
+                "$or": [{"embedding": {"$exists": False}}, {"embedding_dirty": True}]
+            })
+            if self.cache is not None:
+                return [self.cache.put(config.JOBS_COLLECTION, job) for job in jobs]
             return list(jobs)
         except Exception as e:
             logger.error(f"Error fetching jobs without embedding: {e}")
@@ -97,49 +315,198 @@ class DatabaseManager:
 
     def get_all_jobs(self) -> List[Dict]:
         try:
-            jobs = self.db[config.JOBS_COLLECTION].find({})
-            return list(jobs)
+            if self.cache is not None:
+                cached_jobs = self.cache.get_all_jobs()
+                if cached_jobs is not None:
+                    return cached_jobs
+
+            jobs = list(self.db[config.JOBS_COLLECTION].find({}))
+            if self.cache is not None:
+                return self.cache.put_all_jobs(jobs)
+            return jobs
         except Exception as e:
             logger.error(f"Error fetching jobs: {e}")
             return []
 
     def get_job_by_id(self, job_id: str) -> Optional[Dict]:
         try:
-            return self.db[config.JOBS_COLLECTION].find_one({"_id": ObjectId(job_id)})
+            if self.cache is not None:
+                cached = self.cache.get(config.JOBS_COLLECTION, job_id)
+                if cached is not None:
+                    return cached
+
+            job = self.db[config.JOBS_COLLECTION].find_one({"_id": ObjectId(job_id)})
+            if job and self.cache is not None:
+                job = self.cache.put(config.JOBS_COLLECTION, job)
+            return job
         except Exception as e:
             logger.error(f"Error fetching job {job_id}: {e}")
             return None
 
     def save_job_embedding(self, job_id: str, embedding: List[float]):
         try:
+            fields = {"embedding": embedding, "embedding_updated_at": datetime.utcnow(), "embedding_dirty": False}
             self.db[config.JOBS_COLLECTION].update_one(
                 {"_id": ObjectId(job_id)},
-                {"$set": {"embedding": embedding, "embedding_updated_at": datetime.utcnow()}}
+                {"$set": fields}
             )
+            self._cache_update(config.JOBS_COLLECTION, job_id, fields)
             logger.info(f"Embedding saved for job {job_id}")
         except Exception as e:
             logger.error(f"Error saving embedding for job {job_id}: {e}")
 
-    # Match Operations
-    def save_matches(self, resume_id: str, job_matches: List[Dict]):
+    def mark_job_dirty(self, job_id: str):
+        """Flag a job whose content changed so its embedding is regenerated"""
         try:
-            match_document = {
+            self.db[config.JOBS_COLLECTION].update_one(
+                {"_id": ObjectId(job_id)},
+                {"$set": {"embedding_dirty": True}}
+            )
+            self._cache_update(config.JOBS_COLLECTION, job_id, {"embedding_dirty": True})
+            logger.info(f"Job {job_id} marked for re-embedding")
+        except Exception as e:
+            logger.error(f"Error marking job {job_id} dirty: {e}")
+
+    # Match Operations
+    def _write_matches(self, resume_id: str, job_matches: List[Dict], extra_fields: Dict[str, Any] = None) -> bool:
+        """
+        Persist a ranked match list, skipping the write when it is unchanged.
+
+        The stored fingerprint covers every field of the ranked matches
+        (job ids, scores, reasons; see match_fingerprint) and any extra
+        fields such as user_id are compared too, so a rematch with the
+        same results costs one projected read instead of a full rewrite.
+
+        Returns:
+            True if the document was written, False if it was left as is
+        """
+        fingerprint = match_fingerprint(job_matches)
+        extra_fields = extra_fields or {}
+        collection = self.db[config.MATCHES_COLLECTION]
+
+        projection = {"match_fingerprint": 1}
+        projection.update({field: 1 for field in extra_fields})
+        existing = collection.find_one({"resume_id": ObjectId(resume_id)}, projection)
+
+        if existing and existing.get("match_fingerprint") == fingerprint and all(
+                existing.get(field) == value for field, value in extra_fields.items()):
+            logger.info(f"Matches unchanged for resume {resume_id}, skipping write")
+            return False
+
+        # Reverse index first: the fingerprint is stored last, so a failed
+        # index write leaves the old fingerprint and the next rematch retries
+        self._sync_job_matches(resume_id, job_matches, extra_fields.get("user_id"))
+
+        now = datetime.utcnow()
+        match_document = {
+            "resume_id": ObjectId(resume_id),
+            "matches": job_matches,
+            "match_fingerprint": fingerprint,
+            "updated_at": now
+        }
+        match_document.update(extra_fields)
+
+        collection.update_one(
+            {"resume_id": ObjectId(resume_id)},
+            {"$set": match_document, "$setOnInsert": {"created_at": now}},
+            upsert=True
+        )
+        return True
+
+    def _sync_job_matches(self, resume_id: str, job_matches: List[Dict], user_id=None):
+        """Replace this resume's rows in the job -> resume reverse index"""
+        now = datetime.utcnow()
+        operations = [DeleteMany({"resume_id": ObjectId(resume_id)})]
+        for index, match in enumerate(job_matches):
+            if not match.get("job_id"):
+                continue
+            operations.append(InsertOne({
+                "job_id": ObjectId(match["job_id"]),
                 "resume_id": ObjectId(resume_id),
-                "matches": job_matches,
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
+                "user_id": user_id,
+                "rank": match.get("rank", index + 1),
+                "score": match.get("score"),
+                "match_reason": match.get("match_reason", ""),
+                "updated_at": now
+            }))
+        self.db[config.JOB_MATCHES_COLLECTION].bulk_write(operations, ordered=True)
+
+    def delete_job_matches(self, job_id: str) -> int:
+        """Drop a removed job's rows from the job -> resume reverse index"""
+        try:
+            result = self.db[config.JOB_MATCHES_COLLECTION].delete_many({"job_id": ObjectId(job_id)})
+            logger.info(f"Removed {result.deleted_count} match index rows for deleted job {job_id}")
+            return result.deleted_count
+        except Exception as e:
+            logger.error(f"Error removing match index rows for job {job_id}: {e}")
+            return 0
+
+    def get_matched_resumes_for_job(self, job_id: str, page: int = 1, page_size: int = 20) -> Dict[str, Any]:
+        """
+        List the resumes matched to a job, best score first
+
+        Args:
+            job_id: Job to look up
+            page: 1-based page number
+            page_size: Number of entries per page, at most config.JOB_MATCHES_MAX_PAGE_SIZE
+
+        Returns:
+            Dictionary with the page of (resume_id, user_id, rank, score) entries and the total count
+
+        Raises:
+            ValueError: If page or page_size is below 1
+        """
+        if page < 1 or page_size < 1:
+            raise ValueError(f"page and page_size must be at least 1, got {page} and {page_size}")
+        page_size = min(page_size, config.JOB_MATCHES_MAX_PAGE_SIZE)
+
+        try:
+            query = {"job_id": ObjectId(job_id)}
+            collection = self.db[config.JOB_MATCHES_COLLECTION]
+
+            # rank is the job's position in one resume's list, so it can't order different resumes
+            cursor = collection.find(
+                query,
+                {"_id": 0, "resume_id": 1, "user_id": 1, "rank": 1, "score": 1, "match_reason": 1}
+            ).sort([("score", DESCENDING), ("resume_id", ASCENDING)]).skip((page - 1) * page_size).limit(page_size)
+
+            return {
+                "job_id": job_id,
+                "page": page,
+                "page_size": page_size,
+                "total": collection.count_documents(query),
+                "matches": list(cursor)
             }
+        except Exception as e:
+            logger.error(f"Error fetching matched resumes for job {job_id}: {e}")
+            return {"job_id": job_id, "page": page, "page_size": page_size, "total": 0, "matches": []}
 
-            self.db[config.MATCHES_COLLECTION].update_one(
-                {"resume_id": ObjectId(resume_id)},
-                {"$set": match_document},
-                upsert=True
+    def rebuild_job_match_index(self) -> int:
+        """Backfill the job -> resume reverse index from existing match documents"""
+        rebuilt = 0
+        try:
+            cursor = self.db[config.MATCHES_COLLECTION].find(
+                {}, {"resume_id": 1, "user_id": 1, "matches": 1}
             )
+            for match_doc in cursor:
+                self._sync_job_matches(str(match_doc["resume_id"]), match_doc.get("matches") or [],
+                                       match_doc.get("user_id"))
+                rebuilt += 1
+            logger.info(f"Rebuilt job match index for {rebuilt} resumes")
+        except Exception as e:
+            logger.error(f"Error rebuilding job match index: {e}")
+        return rebuilt
 
-            logger.info(f"Saved {len(job_matches)} matches for resume {resume_id}")
+    def save_matches(self, resume_id: str, job_matches: List[Dict]) -> bool:
+        try:
+            written = self._write_matches(resume_id, job_matches)
+            if written:
+                logger.info(f"Saved {len(job_matches)} matches for resume {resume_id}")
+            return written
 
         except Exception as e:
             logger.error(f"Error saving matches for resume {resume_id}: {e}")
+            return False
 
     def get_matches_by_resume(self, resume_id: str) -> Optional[Dict]:
         try:
@@ -165,26 +532,38 @@ class DatabaseManager:
             logger.error(f"Error fetching processing stats: {e}")
             return {}
 
-    def save_matches_with_user(self, resume_id: str, user_id: str, job_matches: List[Dict]):
+    def save_matches_with_user(self, resume_id: str, user_id: str, job_matches: List[Dict]) -> bool:
         try:
-            match_document = {
-                "resume_id": ObjectId(resume_id),
-                "user_id": ObjectId(user_id),  # ✅ Foreign key link
-                "matches": job_matches,
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            }
-
-            self.db[config.MATCHES_COLLECTION].update_one(
-                {"resume_id": ObjectId(resume_id)},
-                {"$set": match_document},
-                upsert=True
+            written = self._write_matches(
+                resume_id,
+                job_matches,
+                {"user_id": ObjectId(user_id)}  # ✅ Foreign key link
             )
-
-            logger.info(f"Saved {len(job_matches)} matches for resume {resume_id} (user: {user_id})")
+            if written:
+                logger.info(f"Saved {len(job_matches)} matches for resume {resume_id} (user: {user_id})")
+            return written
 
         except Exception as e:
             logger.error(f"Error saving matches with user_id for resume {resume_id}: {e}")
+            return False
+
+
+def _fingerprint_value(value):
+    # Round scores so float noise between identical rematches isn't a change
+    if isinstance(value, numbers.Real) and not isinstance(value, numbers.Integral):
+        return round(float(value), 4)
+    return value
+
+
+def match_fingerprint(job_matches: List[Dict]) -> str:
+    """Stable hash of a ranked match list, covering every persisted field of each match"""
+    ranked = [
+        {field: _fingerprint_value(value) for field, value in match.items()}
+        for match in job_matches
+    ]
+    payload = json.dumps(ranked, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
 
 # ✅ Global database instance
 db_manager = DatabaseManager()
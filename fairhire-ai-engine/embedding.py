@@ -2,12 +2,18 @@
 Text embedding generation using sentence transformers
 """
 import logging
+import multiprocessing
+import threading
 import numpy as np
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from sentence_transformers import SentenceTransformer
 import torch
 from sklearn.preprocessing import normalize
 import config
+from encoder_worker import encode_bucketed, encode_shard, init_worker
+from utils import iter_chunks
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +34,154 @@ class EmbeddingGenerator:
             logger.error(f"Failed to load embedding model: {e}")
             raise
 
+    def iter_text_chunks(self, text: str, overlap: int = None) -> Iterator[str]:
+        """
+        Lazily split text into chunks the model encodes without truncation
+
+        Args:
+            text: Input text
+            overlap: Tokens shared by consecutive chunks (default config.EMBEDDING_CHUNK_OVERLAP)
+
+        Yields:
+            Text chunks of at most max_seq_length tokens, special tokens included
+        """
+        max_tokens = self.model.max_seq_length - 2  # [CLS] and [SEP]
+        overlap = config.EMBEDDING_CHUNK_OVERLAP if overlap is None else overlap
+        overlap = min(overlap, max_tokens // 2)
+        return iter_chunks(text, max_tokens, overlap, tokenizer=self.model.tokenizer)
+
+    def encode_chunked(self, text: str, pooling: str = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Encode text of any length without truncation
+
+        The text is split into max_seq_length token chunks, all chunks are
+        encoded in one batched call, and their vectors are pooled.
+
+        Args:
+            text: Input text
+            pooling: "mean" or "weighted" by chunk length (default config.EMBEDDING_POOLING)
+
+        Returns:
+            Tuple of (normalized pooled vector, normalized chunk vectors), or None for empty text
+        """
+        chunks = [chunk for chunk in self.iter_text_chunks(text) if chunk.strip()]
+        if not chunks:
+            return None
+
+        vectors = self.model.encode(chunks, batch_size=config.EMBEDDING_BATCH_SIZE,
+                                    convert_to_numpy=True, normalize_embeddings=True)
+
+        return pool_chunk_vectors(vectors, chunks, pooling), vectors
+
+    def encode_many(self, texts: List[str], shard_size: int = None) -> List[Optional[np.ndarray]]:
+        """
+        encode_batch across a pool of CPU encoder processes
+
+        For backfills: texts are split into shards encoded by
+        config.EMBEDDING_WORKERS processes, each holding its own model and
+        limited to config.EMBEDDING_THREADS_PER_WORKER torch threads so the
+        workers don't oversubscribe the cores. On GPU, for small inputs or
+        for a non-default model, texts are encoded in-process.
+
+        Args:
+            texts: List of input texts
+            shard_size: Texts per pool task (default config.EMBEDDING_SHARD_SIZE)
+
+        Returns:
+            One normalized float32 vector per text, in input order; None for empty texts
+        """
+        global _encoder_pool
+
+        if (self.device != 'cpu' or self.model_name != config.EMBEDDING_MODEL
+                or len(texts) < config.EMBEDDING_POOL_MIN_TEXTS or config.EMBEDDING_WORKERS < 2):
+            return self.encode_batch(texts)
+
+        shard_size = shard_size or config.EMBEDDING_SHARD_SIZE
+        shards = [texts[start:start + shard_size] for start in range(0, len(texts), shard_size)]
+        try:
+            pool = get_encoder_pool()
+            return [vector for shard in pool.map(encode_shard, shards) for vector in shard]
+        except BrokenProcessPool as e:
+            logger.warning(f"Encoder pool failed ({e}), encoding in-process")
+            _encoder_pool = None
+            return self.encode_batch(texts)
+
+    def encode_documents(self, texts: List[str],
+                         pooling: str = None) -> List[Optional[Tuple[np.ndarray, np.ndarray]]]:
+        """
+        encode_chunked for many texts, with every chunk encoded through encode_many
+
+        Args:
+            texts: List of input texts
+            pooling: "mean" or "weighted" by chunk length (default config.EMBEDDING_POOLING)
+
+        Returns:
+            One (normalized pooled vector, normalized chunk vectors) tuple per text,
+            in input order; None for empty texts
+        """
+        chunks, owners = [], []
+        for index, text in enumerate(texts):
+            if not text or not text.strip():
+                continue
+            for chunk in self.iter_text_chunks(text):
+                if chunk.strip():
+                    chunks.append(chunk)
+                    owners.append(index)
+
+        grouped: Dict[int, List[int]] = {}
+        for position, owner in enumerate(owners):
+            grouped.setdefault(owner, []).append(position)
+
+        vectors = self.encode_many(chunks)
+        results: List[Optional[Tuple[np.ndarray, np.ndarray]]] = [None] * len(texts)
+        for owner, positions in grouped.items():
+            if any(vectors[position] is None for position in positions):
+                continue
+            chunk_vectors = np.stack([vectors[position] for position in positions])
+            pooled = pool_chunk_vectors(chunk_vectors, [chunks[position] for position in positions], pooling)
+            results[owner] = pooled, chunk_vectors
+        return results
+
+    def build_resume_text(self, parsed_resume: Dict[str, Any]) -> str:
+        """Combine the resume fields used for matching into one text"""
+        text_parts = []
+
+        # Add contact info
+        if parsed_resume.get('contact_info'):
+            contact = parsed_resume['contact_info']
+            if contact.get('name'):
+                text_parts.append(f"Name: {contact['name']}")
+
+        # Add skills
+        if parsed_resume.get('skills'):
+            skills_text = " ".join(parsed_resume['skills'])
+            text_parts.append(f"Skills: {skills_text}")
+
+        # Add experience
+        if parsed_resume.get('experience'):
+            for exp in parsed_resume['experience']:
+                exp_text = f"{exp.get('title', '')} at {exp.get('company', '')}"
+                if exp_text.strip():
+                    text_parts.append(exp_text)
+
+        # Add education
+        if parsed_resume.get('education'):
+            for edu in parsed_resume['education']:
+                if edu.get('degree'):
+                    text_parts.append(edu['degree'])
+
+        # Add summary
+        if parsed_resume.get('summary'):
+            text_parts.append(parsed_resume['summary'])
+
+        # Add certifications
+        if parsed_resume.get('certifications'):
+            cert_text = " ".join(parsed_resume['certifications'])
+            text_parts.append(f"Certifications: {cert_text}")
+
+        # Combine all text
+        return " ".join(text_parts)
+
     def generate_resume_embedding(self, parsed_resume: Dict[str, Any]) -> Optional[List[float]]:
         """
         Generate embedding for a resume
@@ -38,62 +192,74 @@ class EmbeddingGenerator:
         Returns:
             List of embedding values or None if failed
         """
+        embeddings = self.generate_resume_embeddings(parsed_resume)
+        return embeddings['embedding'] if embeddings else None
+
+    def generate_resume_embeddings(self, parsed_resume: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Generate the pooled embedding of a resume together with its chunk embeddings
+
+        Args:
+            parsed_resume: Dictionary containing parsed resume data
+
+        Returns:
+            Dictionary with 'embedding' (pooled) and 'chunk_embeddings', or None if failed
+        """
         try:
-            # Combine relevant text fields
-            text_parts = []
-
-            # Add contact info
-            if parsed_resume.get('contact_info'):
-                contact = parsed_resume['contact_info']
-                if contact.get('name'):
-                    text_parts.append(f"Name: {contact['name']}")
-
-            # Add skills
-            if parsed_resume.get('skills'):
-                skills_text = " ".join(parsed_resume['skills'])
-                text_parts.append(f"Skills: {skills_text}")
-
-            # Add experience
-            if parsed_resume.get('experience'):
-                for exp in parsed_resume['experience']:
-                    exp_text = f"{exp.get('title', '')} at {exp.get('company', '')}"
-                    if exp_text.strip():
-                        text_parts.append(exp_text)
-
-            # Add education
-            if parsed_resume.get('education'):
-                for edu in parsed_resume['education']:
-                    if edu.get('degree'):
-                        text_parts.append(edu['degree'])
-
-            # Add summary
-            if parsed_resume.get('summary'):
-                text_parts.append(parsed_resume['summary'])
-
-            # Add certifications
-            if parsed_resume.get('certifications'):
-                cert_text = " ".join(parsed_resume['certifications'])
-                text_parts.append(f"Certifications: {cert_text}")
-
-            # Combine all text
-            combined_text = " ".join(text_parts)
+            combined_text = self.build_resume_text(parsed_resume)
 
             if not combined_text.strip():
                 logger.warning("No text content found for embedding generation")
                 return None
 
-            # Generate embedding
-            embedding = self.model.encode(combined_text, convert_to_tensor=False)
+            pooled, chunk_vectors = self.encode_chunked(combined_text)
 
-            # Normalize embedding
-            embedding = normalize(embedding.reshape(1, -1))[0]
-
-            return embedding.tolist()
+            return {
+                'embedding': pooled.tolist(),
+                'chunk_embeddings': chunk_vectors.tolist()
+            }
 
         except Exception as e:
             logger.error(f"Error generating resume embedding: {e}")
             return None
 
+    def build_job_text(self, job_data: Dict[str, Any]) -> str:
+        """Combine the job fields used for matching into one text"""
+        text_parts = []
+
+        # Add job title
+        if job_data.get('title'):
+            text_parts.append(f"Job Title: {job_data['title']}")
+
+        # Add company name
+        if job_data.get('company'):
+            text_parts.append(f"Company: {job_data['company']}")
+
+        # Add job description
+        if job_data.get('description'):
+            text_parts.append(job_data['description'])
+
+        # Add required skills
+        if job_data.get('required_skills'):
+            skills_text = " ".join(job_data['required_skills'])
+            text_parts.append(f"Required Skills: {skills_text}")
+
+        # Add preferred skills
+        if job_data.get('preferred_skills'):
+            skills_text = " ".join(job_data['preferred_skills'])
+            text_parts.append(f"Preferred Skills: {skills_text}")
+
+        # Add location
+        if job_data.get('location'):
+            text_parts.append(f"Location: {job_data['location']}")
+
+        # Add experience level
+        if job_data.get('experience_level'):
+            text_parts.append(f"Experience Level: {job_data['experience_level']}")
+
+        # Combine all text
+        return " ".join(text_parts)
+
     def generate_job_embedding(self, job_data: Dict[str, Any]) -> Optional[List[float]]:
         """
         Generate embedding for a job posting
@@ -105,50 +271,14 @@ class EmbeddingGenerator:
             List of embedding values or None if failed
         """
         try:
-            text_parts = []
-
-            # Add job title
-            if job_data.get('title'):
-                text_parts.append(f"Job Title: {job_data['title']}")
-
-            # Add company name
-            if job_data.get('company'):
-                text_parts.append(f"Company: {job_data['company']}")
-
-            # Add job description
-            if job_data.get('description'):
-                text_parts.append(job_data['description'])
-
-            # Add required skills
-            if job_data.get('required_skills'):
-                skills_text = " ".join(job_data['required_skills'])
-                text_parts.append(f"Required Skills: {skills_text}")
-
-            # Add preferred skills
-            if job_data.get('preferred_skills'):
-                skills_text = " ".join(job_data['preferred_skills'])
-                text_parts.append(f"Preferred Skills: {skills_text}")
-
-            # Add location
-            if job_data.get('location'):
-                text_parts.append(f"Location: {job_data['location']}")
-
-            # Add experience level
-            if job_data.get('experience_level'):
-                text_parts.append(f"Experience Level: {job_data['experience_level']}")
-
-            # Combine all text
-            combined_text = " ".join(text_parts)
+            combined_text = self.build_job_text(job_data)
 
             if not combined_text.strip():
                 logger.warning("No text content found for job embedding generation")
                 return None
 
-            # Generate embedding
-            embedding = self.model.encode(combined_text, convert_to_tensor=False)
-
-            # Normalize embedding
-            embedding = normalize(embedding.reshape(1, -1))[0]
+            # Long descriptions are chunked and pooled rather than truncated
+            embedding, _ = self.encode_chunked(combined_text)
 
             return embedding.tolist()
 
@@ -179,37 +309,44 @@ class EmbeddingGenerator:
             logger.error(f"Error generating text embedding: {e}")
             return None
 
-    def generate_batch_embeddings(self, texts: List[str]) -> List[List[float]]:
+    def generate_batch_embeddings(self, texts: List[str], token_budget: int = None) -> List[Optional[List[float]]]:
         """
         Generate embeddings for multiple texts in batch
 
+        The result lines up with texts: empty texts (and every text, if
+        encoding fails) get None instead of being dropped. Use encode_batch
+        for NumPy rows.
+
         Args:
             texts: List of input texts
+            token_budget: Padded tokens per batch (default config.EMBEDDING_TOKEN_BUDGET)
 
         Returns:
-            List of embedding lists
+            One embedding list per text, in input order; None for empty texts
         """
-        try:
-            if not texts:
-                return []
-
-            # Filter empty texts
-            valid_texts = [text for text in texts if text.strip()]
-
-            if not valid_texts:
-                return []
+        return [None if vector is None else vector.tolist() for vector in self.encode_batch(texts, token_budget)]
 
-            # Generate embeddings in batch
-            embeddings = self.model.encode(valid_texts, convert_to_tensor=False)
+    def encode_batch(self, texts: List[str], token_budget: int = None) -> List[Optional[np.ndarray]]:
+        """
+        Encode many texts in-process, in batches of similar token length
 
-            # Normalize embeddings
-            embeddings = normalize(embeddings)
+        Texts are sorted by token length and packed into batches holding at
+        most token_budget padded tokens, so short texts are not padded to
+        the length of long ones. Texts longer than max_seq_length are
+        truncated; use encode_chunked for those.
 
-            return embeddings.tolist()
+        Args:
+            texts: List of input texts
+            token_budget: Padded tokens per batch (default config.EMBEDDING_TOKEN_BUDGET)
 
+        Returns:
+            One normalized float32 vector per text, in input order; None for empty texts
+        """
+        try:
+            return encode_bucketed(self.model, texts, token_budget)
         except Exception as e:
             logger.error(f"Error generating batch embeddings: {e}")
-            return []
+            return [None] * len(texts)
 
     def compute_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
         """
@@ -283,5 +420,42 @@ class EmbeddingGenerator:
         }
 
 
+def pool_chunk_vectors(vectors: np.ndarray, chunks: List[str], pooling: str = None) -> np.ndarray:
+    """Combine the chunk vectors of one text into a single normalized vector"""
+    pooling = pooling or config.EMBEDDING_POOLING
+    # A short trailing chunk shouldn't count as much as a full one
+    weights = [len(chunk) for chunk in chunks] if pooling == 'weighted' else None
+    pooled = np.average(vectors, axis=0, weights=weights)
+    return normalize(pooled.reshape(1, -1))[0]
+
+
 # Global embedding generator instance
-embedding_generator = EmbeddingGenerator()
\ No newline at end of file
+embedding_generator = EmbeddingGenerator()
+
+
+_encoder_pool = None
+_encoder_pool_lock = threading.Lock()
+
+
+def get_encoder_pool() -> ProcessPoolExecutor:
+    global _encoder_pool
+    if _encoder_pool is None:
+        with _encoder_pool_lock:
+            if _encoder_pool is None:
+                # spawn, not fork: a forked copy of an initialized torch runtime can deadlock.
+                # Workers run encoder_worker, which loads only the model
+                _encoder_pool = ProcessPoolExecutor(
+                    max_workers=config.EMBEDDING_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_worker,
+                    initargs=(config.EMBEDDING_MODEL, config.EMBEDDING_THREADS_PER_WORKER)
+                )
+    return _encoder_pool
+
+
+def shutdown_encoder_pool():
+    global _encoder_pool
+    with _encoder_pool_lock:
+        if _encoder_pool is not None:
+            _encoder_pool.shutdown()
+            _encoder_pool = None
\ No newline at end of file
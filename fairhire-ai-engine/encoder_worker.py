@@ -0,0 +1,86 @@
+"""
+Length-bucketed batch encoding and the CPU encoder pool workers
+
+Kept apart from embedding.py so a spawned pool worker imports only
+torch, sentence-transformers and config, and none of the pipeline's
+global instances (database connection, spaCy, Presidio, Groq).
+"""
+import logging
+import os
+from typing import List, Optional
+import numpy as np
+from sentence_transformers import SentenceTransformer
+import torch
+import config
+
+logger = logging.getLogger(__name__)
+
+# The worker process's own model, loaded by init_worker
+_model = None
+
+
+def encode_bucketed(model: SentenceTransformer, texts: List[str],
+                    token_budget: int = None) -> List[Optional[np.ndarray]]:
+    """
+    Encode texts in batches of similar token length
+
+    Texts are sorted by token length and packed into batches holding at
+    most token_budget padded tokens, so short texts are not padded to
+    the length of long ones. Texts longer than max_seq_length are
+    truncated.
+
+    Args:
+        model: Loaded sentence transformer
+        texts: List of input texts
+        token_budget: Padded tokens per batch (default config.EMBEDDING_TOKEN_BUDGET)
+
+    Returns:
+        One normalized float32 vector per text, in input order; None for empty texts
+    """
+    results: List[Optional[np.ndarray]] = [None] * len(texts)
+    valid = [index for index, text in enumerate(texts) if text and text.strip()]
+    if not valid:
+        return results
+
+    token_budget = token_budget or config.EMBEDDING_TOKEN_BUDGET
+    lengths = [
+        len(ids) for ids in model.tokenizer(
+            [texts[index] for index in valid], truncation=True,
+            max_length=model.max_seq_length
+        )['input_ids']
+    ]
+    # Longest first: each batch is padded to the length of its first text
+    order = sorted(range(len(valid)), key=lambda position: lengths[position], reverse=True)
+
+    embeddings = np.empty((len(valid), model.get_sentence_embedding_dimension()), dtype=np.float32)
+    batch: List[int] = []
+    for position in order + [None]:
+        if batch and (position is None or (len(batch) + 1) * lengths[batch[0]] > token_budget):
+            embeddings[batch] = model.encode(
+                [texts[valid[member]] for member in batch], batch_size=len(batch),
+                convert_to_numpy=True, normalize_embeddings=True
+            )
+            batch = []
+        if position is not None:
+            batch.append(position)
+
+    for position, index in enumerate(valid):
+        results[index] = embeddings[position]
+    return results
+
+
+def init_worker(model_name: str, threads: int):
+    """Process pool initializer: cap this worker's threads and load its model"""
+    global _model
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    torch.set_num_threads(threads)
+    _model = SentenceTransformer(model_name, device='cpu')
+
+
+def encode_shard(texts: List[str]) -> List[Optional[np.ndarray]]:
+    """Process pool entry point: encode one shard of texts"""
+    try:
+        return encode_bucketed(_model, texts)
+    except Exception as e:
+        logger.error(f"Error encoding shard of {len(texts)} texts: {e}")
+        return [None] * len(texts)
@@ -9,30 +9,46 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime
 import argparse
 
-# Import AI components
-from db import db_manager
-from parse_pdf import extract_text, extract_sections_with_llm
-from section_extractor import section_extractor
-from embedding import embedding_generator
-from matcher import job_matcher
-from anonymizer import pii_anonymizer
 import config
 
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),
-    format=config.LOG_FORMAT,
-    handlers=[
-        logging.FileHandler('ai_engine.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-
 logger = logging.getLogger(__name__)
 
+# AI components, imported by load_components(): importing them connects to
+# MongoDB and loads the models, which must not happen at import time
+db_manager = resume_parser = text_cache = section_extractor = None
+embedding_generator = shutdown_encoder_pool = job_matcher = pii_anonymizer = None
+
+
+def configure_logging():
+    logging.basicConfig(
+        level=getattr(logging, config.LOG_LEVEL),
+        format=config.LOG_FORMAT,
+        handlers=[
+            logging.FileHandler('ai_engine.log'),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
+
+def load_components():
+    """Import the AI components (database connection, models) on first use"""
+    global db_manager, resume_parser, text_cache, section_extractor
+    global embedding_generator, shutdown_encoder_pool, job_matcher, pii_anonymizer
+    if db_manager is not None:
+        return
+
+    from db import db_manager
+    from resume_parser import resume_parser
+    from text_cache import text_cache
+    from section_extractor import section_extractor
+    from embedding import embedding_generator, shutdown_encoder_pool
+    from matcher import job_matcher
+    from anonymizer import pii_anonymizer
+
 
 class AIEnginePipeline:
     def __init__(self):
+        load_components()
         self.stats = {
             'processed_resumes': 0,
             'failed_resumes': 0,
@@ -42,6 +58,10 @@ class AIEnginePipeline:
         }
 
     def process_single_resume(self, resume_id: str) -> bool:
+        with db_manager.run_cache():
+            return self._process_single_resume(resume_id)
+
+    def _process_single_resume(self, resume_id: str) -> bool:
         start_time = time.time()
 
         try:
@@ -58,7 +78,10 @@ class AIEnginePipeline:
                 return False
 
             logger.info(f"Extracting text from {file_path}")
-            extracted_text = extract_text(file_path)
+            known_sha256 = resume.get('file_sha256') if resume.get('file_sha256_path') == file_path else None
+            extracted_text, file_sha256 = text_cache.get_text(file_path, known_sha256)
+            if file_sha256 and file_sha256 != known_sha256:
+                db_manager.save_resume_file_hash(resume_id, file_path, file_sha256)
 
             if not extracted_text:
                 logger.error(f"Failed to extract text from {file_path}")
@@ -67,15 +90,17 @@ class AIEnginePipeline:
                 return False
 
             logger.info(f"Parsing resume sections for {resume_id}")
-            parsed_data = extract_sections_with_llm(extracted_text)
+            parsed_data = resume_parser.parse(extracted_text)
 
             db_manager.update_resume_status(resume_id, "processed", parsed_data)
 
             logger.info(f"Generating embedding for {resume_id}")
-            embedding = embedding_generator.generate_resume_embedding(parsed_data)
+            embeddings = embedding_generator.generate_resume_embeddings(parsed_data)
+            embedding = embeddings['embedding'] if embeddings else None
 
             if embedding:
-                db_manager.save_resume_embedding(resume_id, embedding)
+                chunk_embeddings = embeddings['chunk_embeddings'] if config.EMBEDDING_KEEP_CHUNK_VECTORS else None
+                db_manager.save_resume_embedding(resume_id, embedding, chunk_embeddings)
                 self.stats['generated_embeddings'] += 1
 
                 # ✅ Embed new jobs on-the-fly if needed
@@ -83,28 +108,20 @@ class AIEnginePipeline:
                 if job_docs:
                     logger.info(f"Generating embeddings for {len(job_docs)} new jobs...")
                     for job in job_docs:
-                        job_text = f"{job.get('title', '')}\n{job.get('description', '')}"
-                        job_embedding = embedding_generator.generate_job_embedding(job_text)
-                        db_manager.save_job_embedding(str(job['_id']), job_embedding)
+                        job_embedding = embedding_generator.generate_job_embedding(job)
+                        if job_embedding:
+                            db_manager.save_job_embedding(str(job['_id']), job_embedding)
 
                 logger.info(f"Finding job matches for {resume_id}")
                 matches = job_matcher.find_matches_for_resume(resume_id)
                 logger.info(f"🎯 Matches returned from job_matcher: {matches}")
 
                 if matches:
+                    # job_matcher has already persisted the ranked matches
                     self.stats['generated_matches'] += len(matches)
                     logger.info(f"Found {len(matches)} matches for {resume_id}")
-                    db_manager.save_matches_with_user(
-                        resume_id,
-                        user_id=str(resume.get('user_id')),
-                        matches=[
-                            {"job_id": job["_id"], "match_reason": job.get("match_reason", "")}
-                            for job in matches
-                        ]
-                    )
-                    logger.info(f"💾 Saved {len(matches)} matches for resume {resume_id}")
-
-            if hasattr(resume, 'anonymize') and resume.get('anonymize'):
+
+            if resume.get('anonymize'):
                 logger.info(f"Anonymizing resume {resume_id}")
                 anonymized_data = pii_anonymizer.anonymize_resume(parsed_data)
                 db_manager.update_resume_status(resume_id, "processed", anonymized_data)
@@ -123,6 +140,10 @@ class AIEnginePipeline:
             return False
 
     def process_batch(self, limit: int = 100) -> Dict[str, Any]:
+        with db_manager.run_cache():
+            return self._process_batch(limit)
+
+    def _process_batch(self, limit: int) -> Dict[str, Any]:
         logger.info(f"Starting batch processing (limit: {limit})")
         pending_resumes = db_manager.get_pending_resumes(limit)
 
@@ -167,7 +188,7 @@ class AIEnginePipeline:
             try:
                 job_id = str(job['_id'])
 
-                if 'embedding' in job:
+                if 'embedding' in job and not job.get('embedding_dirty'):
                     continue
 
                 embedding = embedding_generator.generate_job_embedding(job)
@@ -197,8 +218,9 @@ class AIEnginePipeline:
         logger.info("Starting full AI pipeline")
         start_time = time.time()
 
-        job_results = self.process_jobs(job_limit)
-        resume_results = self.process_batch(resume_limit)
+        with db_manager.run_cache():
+            job_results = self.process_jobs(job_limit)
+            resume_results = self.process_batch(resume_limit)
 
         total_time = time.time() - start_time
         stats = db_manager.get_processing_stats()
@@ -216,6 +238,35 @@ class AIEnginePipeline:
 
         return results
 
+    def reembed_all(self) -> Dict[str, Any]:
+        """Regenerate every job and processed resume embedding, encoding across the CPU encoder pool"""
+        logger.info("Re-embedding all jobs and processed resumes")
+        results = {}
+        try:
+            jobs = db_manager.get_all_jobs()
+            job_vectors = embedding_generator.encode_documents(
+                [embedding_generator.build_job_text(job) for job in jobs])
+            for job, vectors in zip(jobs, job_vectors):
+                if vectors is not None:
+                    db_manager.save_job_embedding(str(job['_id']), vectors[0].tolist())
+            results['jobs'] = sum(vectors is not None for vectors in job_vectors)
+
+            resumes = db_manager.get_processed_resumes()
+            resume_vectors = embedding_generator.encode_documents(
+                [embedding_generator.build_resume_text(resume['parsed_data']) for resume in resumes])
+            for resume, vectors in zip(resumes, resume_vectors):
+                if vectors is not None:
+                    pooled, chunk_vectors = vectors
+                    # Without chunk vectors the resume's old ones are unset
+                    chunk_embeddings = chunk_vectors.tolist() if config.EMBEDDING_KEEP_CHUNK_VECTORS else None
+                    db_manager.save_resume_embedding(str(resume['_id']), pooled.tolist(), chunk_embeddings)
+            results['resumes'] = sum(vectors is not None for vectors in resume_vectors)
+        finally:
+            shutdown_encoder_pool()
+
+        logger.info(f"Re-embedding complete: {results}")
+        return results
+
     def cleanup_failed_resumes(self) -> int:
         logger.info("Cleaning up failed resumes")
         logger.info("Failed resume cleanup not implemented yet")
@@ -230,6 +281,9 @@ class AIEnginePipeline:
             'database_stats': stats,
             'matching_stats': matching_stats,
             'pipeline_stats': self.stats,
+            'connection_pool': db_manager.get_pool_metrics(),
+            'text_cache': text_cache.stats,
+            'parser': resume_parser.stats,
             'system_info': {
                 'embedding_model': embedding_generator.get_model_info(),
                 'similarity_threshold': config.SIMILARITY_THRESHOLD,
@@ -242,13 +296,15 @@ class AIEnginePipeline:
 
 def main():
     parser = argparse.ArgumentParser(description='FairHireQuest AI Engine')
-    parser.add_argument('--mode', choices=['single', 'batch', 'jobs', 'full', 'report', 'match'],
+    parser.add_argument('--mode', choices=['single', 'batch', 'jobs', 'full', 'report', 'match', 'watch',
+                                           'reindex-matches', 'reembed'],
                         default='batch', help='Processing mode')
     parser.add_argument('--resume-id', help='Resume ID for single processing')
     parser.add_argument('--limit', type=int, default=100, help='Processing limit')
     parser.add_argument('--job-limit', type=int, default=100, help='Job processing limit')
 
     args = parser.parse_args()
+    configure_logging()
     pipeline = AIEnginePipeline()
 
     try:
@@ -287,6 +343,17 @@ def main():
                 from matcher import job_matcher
                 job_matcher.find_matches_for_resume(args.resume_id)
 
+        elif args.mode == 'reindex-matches':
+            db_manager.rebuild_job_match_index()
+
+        elif args.mode == 'reembed':
+            results = pipeline.reembed_all()
+            logger.info(f"Re-embedding results: {results}")
+
+        elif args.mode == 'watch':
+            from watcher import ChangeStreamWatcher
+            ChangeStreamWatcher(pipeline).run_forever()
+
 
     except KeyboardInterrupt:
         logger.info("Processing interrupted by user")
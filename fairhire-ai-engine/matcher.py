@@ -33,7 +33,7 @@ class JobMatcher:
 
         similarities = cosine_similarity([resume_emb], job_embeddings)[0]
         top_k_indices = np.argsort(similarities)[::-1][:k]
-        return [valid_jobs[i] for i in top_k_indices]
+        return [dict(valid_jobs[i], similarity_score=float(similarities[i])) for i in top_k_indices]
 
     def find_matches_for_resume(self, resume_id: str) -> List[Dict[str, Any]]:
         try:
@@ -83,7 +83,8 @@ class JobMatcher:
                 if not job_id or job_id not in job_dict:
                     continue
 
-                job_info = job_dict[job_id]
+                # Copy so the cached job document is not mutated per resume
+                job_info = dict(job_dict[job_id])
                 job_info["match_reason"] = match.get("reason", "")
                 matched_jobs.append(job_info)
 
@@ -94,21 +95,23 @@ class JobMatcher:
             logger.info(f" Attempting to save {len(matched_jobs)} matches for resume {resume_id} and user {user_id}")
 
             try:
-                db_manager.save_matches_with_user(
+                written = db_manager.save_matches_with_user(
                     resume_id,
                     user_id,
                     [
                         {
                             "job_id": job["_id"],
                             "match_reason": job.get("match_reason", ""),
-                            "rank": index + 1  # ✅ Add rank based on position
+                            "rank": index + 1,  # ✅ Add rank based on position
+                            "score": job.get("similarity_score")
                         }
                         for index, job in enumerate(matched_jobs)
                     ]
 
                 )
-                logger.info(
-                    f"Saved {len(matched_jobs)} matches for resume {resume_id} (user: {user_id})")  # ✅ Add this here
+                if written:
+                    logger.info(
+                        f"Saved {len(matched_jobs)} matches for resume {resume_id} (user: {user_id})")  # ✅ Add this here
             except Exception as e:
                 logger.warning(f"Failed to save matches for resume {resume_id}: {e}")
 
@@ -0,0 +1,202 @@
+"""
+Shared MongoDB connection pool for threads, worker processes and asyncio stages
+"""
+import logging
+import os
+import threading
+from typing import Dict, Any
+from pymongo import MongoClient, monitoring
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Counts connection pool events so utilization can be reported"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.created = 0
+            self.closed = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.in_use = 0
+            self.peak_in_use = 0
+            self.pool_clears = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'connections_created': self.created,
+                'connections_closed': self.closed,
+                'connections_open': self.created - self.closed,
+                'connections_in_use': self.in_use,
+                'peak_in_use': self.peak_in_use,
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'pool_clears': self.pool_clears
+            }
+
+
+class MongoConnectionPool:
+    """
+    Owns the process-wide MongoClient (and its Motor twin for asyncio code).
+
+    Clients are created lazily and re-created after a fork, since a
+    MongoClient inherited from the parent process must not be reused.
+    """
+
+    def __init__(self, uri: str = None, db_name: str = None, **client_options):
+        self.uri = uri or config.MONGODB_URI
+        self.db_name = db_name or config.DB_NAME
+        self.client_options = {
+            'maxPoolSize': config.MONGO_MAX_POOL_SIZE,
+            'minPoolSize': config.MONGO_MIN_POOL_SIZE,
+            'maxIdleTimeMS': config.MONGO_MAX_IDLE_TIME_MS,
+            'waitQueueTimeoutMS': config.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            'serverSelectionTimeoutMS': config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        }
+        self.client_options.update(client_options)
+
+        self.metrics_listener = PoolMetricsListener()
+        self._lock = threading.Lock()
+        self._client = None
+        self._async_client = None
+        self._pid = os.getpid()
+
+    def _check_pid(self):
+        """Drop clients inherited from a parent process"""
+        if self._pid != os.getpid():
+            self.reset_after_fork()
+
+    def reset_after_fork(self):
+        """
+        Forget clients created in the parent process.
+
+        The inherited sockets belong to the parent, so they are discarded
+        without being closed and a fresh client is built on next use.
+        """
+        self._lock = threading.Lock()
+        self._client = None
+        self._async_client = None
+        self._pid = os.getpid()
+        self.metrics_listener = PoolMetricsListener()
+
+    @property
+    def client(self) -> MongoClient:
+        self._check_pid()
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = MongoClient(
+                        self.uri,
+                        event_listeners=[self.metrics_listener],
+                        **self.client_options
+                    )
+                    logger.info(f"Created MongoDB client (pid {self._pid}, "
+                                f"maxPoolSize={self.client_options['maxPoolSize']})")
+        return self._client
+
+    def get_database(self, name: str = None):
+        return self.client[name or self.db_name]
+
+    @property
+    def async_client(self):
+        """Motor client sharing this pool's settings, for asyncio stages"""
+        self._check_pid()
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    try:
+                        from motor.motor_asyncio import AsyncIOMotorClient
+                    except ImportError:
+                        logger.error("Motor not installed. Install with: pip install motor")
+                        raise
+                    self._async_client = AsyncIOMotorClient(
+                        self.uri,
+                        event_listeners=[self.metrics_listener],
+                        **self.client_options
+                    )
+                    logger.info(f"Created async MongoDB client (pid {self._pid})")
+        return self._async_client
+
+    def get_async_database(self, name: str = None):
+        return self.async_client[name or self.db_name]
+
+    def metrics(self) -> Dict[str, Any]:
+        stats = self.metrics_listener.snapshot()
+        max_pool_size = self.client_options.get('maxPoolSize') or 0
+        stats.update({
+            'pid': self._pid,
+            'max_pool_size': max_pool_size,
+            'min_pool_size': self.client_options.get('minPoolSize'),
+            'utilization': round(stats['connections_in_use'] / max_pool_size, 3) if max_pool_size else 0.0,
+            'async_client': self._async_client is not None
+        })
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+            if self._async_client is not None:
+                self._async_client.close()
+                self._async_client = None
+
+
+def init_worker():
+    """ProcessPoolExecutor initializer: make sure the worker builds its own client"""
+    mongo_pool.reset_after_fork()
+
+
+# Global connection pool instance
+mongo_pool = MongoConnectionPool()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=mongo_pool.reset_after_fork)
@@ -1,12 +1,20 @@
 import os
 import json
+import hashlib
+import logging
 import requests
 import tempfile
+import threading
 import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
+from typing import List, Optional
 from dotenv import load_dotenv
 from groq import Groq
 from config import GROQ_API_KEY
-from PyPDF2 import PdfReader
+import config
+from anonymizer import pii_anonymizer, restore_placeholders
 
 # ✅ Load environment variables
 load_dotenv()
@@ -14,29 +22,58 @@ load_dotenv()
 # ✅ Initialize Groq client
 client = Groq(api_key=GROQ_API_KEY)
 
-def extract_sections_with_llm(text: str) -> dict:
+logger = logging.getLogger(__name__)
+
+# Fields the LLM parser can return, with the wording used in the prompt
+LLM_FIELD_PROMPTS = {
+    "name": "Name",
+    "email": "Email",
+    "phone": "Phone",
+    "location": "Location",
+    "summary_or_objective": "Summary or Objective",
+    "skills": "Skills (as list)",
+    "education": "Education (as list of {institution, degree, year})",
+    "experience": "Experience (as list of {title, company, years})",
+    "projects": "Projects (if any, as list)",
+    "certifications": "Certifications",
+    "languages": "Languages",
+    "linkedin": "LinkedIn (optional)",
+    "github": "GitHub (optional)",
+    "portfolio": "Portfolio (optional)",
+}
+LIST_FIELDS = ["skills", "education", "experience", "projects", "certifications", "languages"]
+
+
+def extract_sections_with_llm(text: str, fields: Optional[List[str]] = None) -> dict:
+    """
+    Parse resume text with the LLM.
+
+    When fields is given, only those fields are requested, which keeps the
+    prompt (and the response) short for partial re-parsing. With
+    config.LLM_PII_MASKING, names, emails and phone numbers are replaced by
+    placeholders before the request and restored in the parsed result.
+    """
+    fields = fields or list(LLM_FIELD_PROMPTS)
+    field_list = "\n".join(f"- {LLM_FIELD_PROMPTS[field]}" for field in fields)
+
+    placeholders = {}
+    llm_text = text
+    if config.LLM_PII_MASKING:
+        llm_text, placeholders = pii_anonymizer.pseudonymize(text)
+    placeholder_note = (
+        "\nValues like <EMAIL_ADDRESS_1> are redacted; copy them into the output exactly as written.\n"
+        if placeholders else ""
+    )
+
     prompt = f"""
 You are an expert resume parser. Given the following resume text, extract these sections clearly:
 
-- Name
-- Email
-- Phone 
-- Location
-- Summary or Objective
-- Skills (as list)
-- Education (as list of {{institution, degree, year}})
-- Experience (as list of {{title, company, years}})
-- Projects (if any, as list)
-- Certifications
-- Languages
-- LinkedIn (optional)
-- GitHub (optional)
-- Portfolio (optional)
+{field_list}
 
 If any section is missing in the resume, return its value as null (or an empty array for list-type fields).
-
+{placeholder_note}
 Resume Text:
-{text}
+{llm_text}
 
 Return only a clean JSON object.
 """
@@ -62,24 +99,22 @@ Return only a clean JSON object.
             clean_key = key.strip().lower().replace(" ", "_")
             normalized[clean_key] = value
 
+        normalized = restore_placeholders(normalized, placeholders)
+
         # ✅ Fix phone field
-        if normalized.get("phone_number"):
-            normalized["phone"] = fix_phone_format(normalized.pop("phone_number"))
-        elif normalized.get("phone"):
-            normalized["phone"] = fix_phone_format(normalized["phone"])
-        else:
-            fallback = fallback_phone_extraction(text)
-            normalized["phone"] = fix_phone_format(fallback) if fallback else None
+        if "phone" in fields:
+            if normalized.get("phone_number"):
+                normalized["phone"] = fix_phone_format(normalized.pop("phone_number"))
+            elif normalized.get("phone"):
+                normalized["phone"] = fix_phone_format(normalized["phone"])
+            else:
+                fallback = fallback_phone_extraction(text)
+                normalized["phone"] = fix_phone_format(fallback) if fallback else None
 
         # ✅ Ensure all fields exist
-        expected_fields = [
-            "name", "email", "phone", "location", "summary_or_objective",
-            "skills", "education", "experience", "projects", "certifications",
-            "languages", "linkedin", "github", "portfolio"
-        ]
-        for field in expected_fields:
+        for field in fields:
             if field not in normalized:
-                normalized[field] = [] if field in ["skills", "education", "experience", "projects", "certifications", "languages"] else None
+                normalized[field] = [] if field in LIST_FIELDS else None
 
         return normalized
 
@@ -91,28 +126,451 @@ Return only a clean JSON object.
         }
 
 
+def _is_pdf_bytes(source) -> bool:
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+
+class PDFExtractor:
+    """Base class for a PDF text extraction backend"""
+    name = ""
+
+    def available(self) -> bool:
+        raise NotImplementedError
+
+    def page_count(self, source) -> int:
+        raise NotImplementedError
+
+    def extract_pages(self, source, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        """Return the text of pages [start, stop); source is a file path or PDF bytes"""
+        raise NotImplementedError
+
+
+class PyMuPDFExtractor(PDFExtractor):
+    """MuPDF via PyMuPDF (fitz): native code, by far the fastest backend"""
+    name = "pymupdf"
+
+    def available(self) -> bool:
+        try:
+            import fitz  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def _open(self, source):
+        import fitz
+        if _is_pdf_bytes(source):
+            return fitz.open(stream=bytes(source), filetype="pdf")
+        return fitz.open(source)
+
+    def page_count(self, source) -> int:
+        doc = self._open(source)
+        try:
+            return doc.page_count
+        finally:
+            doc.close()
+
+    def extract_pages(self, source, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        doc = self._open(source)
+        try:
+            stop = doc.page_count if stop is None else min(stop, doc.page_count)
+            return [doc[index].get_text() or "" for index in range(start, stop)]
+        finally:
+            doc.close()
+
+
+class PdfPlumberExtractor(PDFExtractor):
+    """pdfplumber (pdfminer.six): slower, but copes better with tables and odd layouts"""
+    name = "pdfplumber"
+
+    def available(self) -> bool:
+        try:
+            import pdfplumber  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def _open(self, source):
+        import pdfplumber
+        return pdfplumber.open(BytesIO(bytes(source)) if _is_pdf_bytes(source) else source)
+
+    def page_count(self, source) -> int:
+        with self._open(source) as pdf:
+            return len(pdf.pages)
+
+    def extract_pages(self, source, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        with self._open(source) as pdf:
+            return [page.extract_text() or "" for page in pdf.pages[start:stop]]
+
+
+class PyPDF2Extractor(PDFExtractor):
+    """PyPDF2: pure Python, kept as the last resort"""
+    name = "pypdf2"
+
+    def available(self) -> bool:
+        try:
+            import PyPDF2  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def _open(self, source):
+        from PyPDF2 import PdfReader
+        return PdfReader(BytesIO(bytes(source)) if _is_pdf_bytes(source) else source)
+
+    def page_count(self, source) -> int:
+        return len(self._open(source).pages)
+
+    def extract_pages(self, source, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        reader = self._open(source)
+        stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+        return [reader.pages[index].extract_text() or "" for index in range(start, stop)]
+
+
+# Bump whenever extraction output can change, so cached text is re-extracted
+EXTRACTOR_VERSION = "3"
+
+PDF_EXTRACTORS = {
+    extractor.name: extractor
+    for extractor in (PyMuPDFExtractor(), PdfPlumberExtractor(), PyPDF2Extractor())
+}
+
+# Glyphs a backend emits when it cannot map a font to unicode
+_CID_PATTERN = re.compile(r"\(cid:\d+\)")
+
+
+def text_quality(text: str) -> float:
+    """
+    Score extracted text between 0 (empty/garbage) and 1 (clean)
+
+    Penalizes unmapped (cid:NN) glyphs, unicode replacement characters
+    and control/private-use characters, which are what broken font
+    encodings typically produce.
+    """
+    if not text or not text.strip():
+        return 0.0
+
+    cid_chars = sum(len(match) for match in _CID_PATTERN.findall(text))
+    bad_chars = cid_chars
+    for char in _CID_PATTERN.sub("", text):
+        if char == "\ufffd" or (not char.isprintable() and not char.isspace()):
+            bad_chars += 1
+
+    return max(0.0, 1.0 - bad_chars / len(text))
+
+
+def is_garbled(text: str) -> bool:
+    return (len(text.strip()) < config.PDF_MIN_TEXT_CHARS
+            or text_quality(text) < config.PDF_MIN_TEXT_QUALITY)
+
+
+def get_extractor_order(backends: Optional[List[str]] = None) -> List[PDFExtractor]:
+    names = backends or config.PDF_EXTRACTOR_ORDER
+    return [PDF_EXTRACTORS[name] for name in names if name in PDF_EXTRACTORS and PDF_EXTRACTORS[name].available()]
+
+
+def extract_pages_bounded(extractor: PDFExtractor, source) -> List[str]:
+    """Extract every page, or at most config.PDF_MAX_PAGES when that cap is set"""
+    page_count = extractor.page_count(source)
+    if config.PDF_MAX_PAGES and page_count > config.PDF_MAX_PAGES:
+        logger.warning(f"PDF has {page_count} pages, extracting only the first {config.PDF_MAX_PAGES} "
+                       f"(PDF_MAX_PAGES)")
+        page_count = config.PDF_MAX_PAGES
+    return extractor.extract_pages(source, 0, page_count)
+
+
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+
+def get_ocr_pool() -> ThreadPoolExecutor:
+    """Threads are enough: pytesseract runs each page in its own tesseract process"""
+    global _ocr_pool
+    if _ocr_pool is None:
+        with _ocr_pool_lock:
+            if _ocr_pool is None:
+                _ocr_pool = ThreadPoolExecutor(max_workers=config.OCR_WORKERS, thread_name_prefix="ocr")
+    return _ocr_pool
+
+
+_ocr_available = None
+
+
+def ocr_available() -> bool:
+    """True when pytesseract, Pillow, PyMuPDF and the tesseract binary are all present"""
+    global _ocr_available
+    if _ocr_available is None:
+        try:
+            import fitz  # noqa: F401
+            import pytesseract
+            from PIL import Image  # noqa: F401
+            pytesseract.get_tesseract_version()
+            _ocr_available = True
+        except Exception:
+            logger.warning("OCR unavailable. Install pytesseract, Pillow and the tesseract binary "
+                           "to read scanned resumes.")
+            _ocr_available = False
+    return _ocr_available
+
+
+def _ocr_image(png: bytes) -> str:
+    """OCR pool entry point: OCR one rendered page"""
+    import pytesseract
+    from PIL import Image
+    # tesseract is killed (RuntimeError) if it runs past the timeout
+    return pytesseract.image_to_string(Image.open(BytesIO(png)), lang=config.OCR_LANGUAGE,
+                                       timeout=config.OCR_PAGE_TIMEOUT)
+
+
+def _ocr_cache_path(png: bytes) -> str:
+    digest = hashlib.sha256(png)
+    digest.update(f"{config.OCR_LANGUAGE}:{config.OCR_DPI}".encode())
+    return os.path.join(config.OCR_CACHE_DIR, f"{digest.hexdigest()}.txt")
+
+
+def fill_textless_pages(source, pages: List[str], max_chars: int = None) -> List[str]:
+    """
+    OCR the pages that came back without a text layer.
+
+    Only pages with fewer than config.OCR_MIN_PAGE_CHARS characters are
+    rendered, in page order and one pool-sized wave at a time; once the
+    text before the next textless page reaches max_chars
+    (config.PDF_MAX_CHARS) the rest are left alone, since
+    limit_page_text would drop them. Each rendered page is looked up in
+    an on-disk cache keyed by its image hash; misses are OCRed
+    concurrently in the OCR pool, each bounded by config.OCR_PAGE_TIMEOUT. Pages that
+    fail or time out stay empty.
+    """
+    textless = [index for index, page in enumerate(pages) if len(page.strip()) < config.OCR_MIN_PAGE_CHARS]
+    if not textless or not config.OCR_ENABLED or not ocr_available():
+        return pages
+
+    import fitz
+    max_chars = max_chars or config.PDF_MAX_CHARS
+    pages = list(pages)
+    wave_size = max(1, config.OCR_WORKERS)
+    doc = fitz.open(stream=bytes(source), filetype="pdf") if _is_pdf_bytes(source) else fitz.open(source)
+    try:
+        for wave_start in range(0, len(textless), wave_size):
+            if sum(len(page) for page in pages[:textless[wave_start]]) >= max_chars:
+                break
+            wave = textless[wave_start:wave_start + wave_size]
+
+            pending = {}
+            for index in wave:
+                png = doc[index].get_pixmap(dpi=config.OCR_DPI).tobytes("png")
+                cache_path = _ocr_cache_path(png)
+                if os.path.exists(cache_path):
+                    with open(cache_path, encoding="utf-8") as cached:
+                        pages[index] = cached.read()
+                else:
+                    pending[index] = (png, cache_path)
+
+            if not pending:
+                continue
+
+            logger.info(f"Running OCR on {len(pending)} page(s) without a text layer")
+            pool = get_ocr_pool()
+            futures = {index: pool.submit(_ocr_image, png) for index, (png, _) in pending.items()}
+            os.makedirs(config.OCR_CACHE_DIR, exist_ok=True)
+
+            for index, future in futures.items():
+                try:
+                    text = future.result(timeout=config.OCR_PAGE_TIMEOUT + 5)
+                except Exception as e:
+                    logger.warning(f"OCR failed for page {index + 1}: {e}")
+                    continue
+                pages[index] = text
+                with open(pending[index][1], "w", encoding="utf-8") as cached:
+                    cached.write(text)
+    finally:
+        doc.close()
+
+    return pages
+
+
+def extraction_settings_digest() -> str:
+    """
+    Short hash of everything that shapes extraction output besides the PDF.
+
+    Covers EXTRACTOR_VERSION, the installed backends in preference order,
+    the page/character caps, the quality thresholds and the OCR setup
+    (including whether tesseract is actually available).
+    """
+    ocr_enabled = config.OCR_ENABLED and ocr_available()
+    settings = {
+        "version": EXTRACTOR_VERSION,
+        "backends": [extractor.name for extractor in get_extractor_order()],
+        "max_pages": config.PDF_MAX_PAGES,
+        "max_chars": config.PDF_MAX_CHARS,
+        "min_text_chars": config.PDF_MIN_TEXT_CHARS,
+        "min_text_quality": config.PDF_MIN_TEXT_QUALITY,
+        "ocr": [config.OCR_LANGUAGE, config.OCR_DPI, config.OCR_MIN_PAGE_CHARS] if ocr_enabled else None,
+    }
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def limit_page_text(pages: List[str], max_chars: int = None) -> List[str]:
+    """Drop text beyond max_chars (config.PDF_MAX_CHARS), truncating the last page kept"""
+    max_chars = max_chars or config.PDF_MAX_CHARS
+    limited, total = [], 0
+    for page in pages:
+        if total + len(page) > max_chars:
+            limited.append(page[:max_chars - total])
+            logger.warning(f"Extracted text truncated to {max_chars} characters (PDF_MAX_CHARS), "
+                           f"page {len(limited)} of {len(pages)} cut short")
+            break
+        limited.append(page)
+        total += len(page)
+    return limited
+
+
+def extract_pdf_pages(source, backends: Optional[List[str]] = None) -> List[str]:
+    """
+    Extract per-page text, trying backends in order of preference.
+
+    The next backend is only tried when the previous output is empty or
+    garbled; if every backend fails the check, the best-scoring output
+    is used. Pages without a text layer are then OCRed once, for the
+    chosen backend only and only up to the character limit.
+    """
+    best_pages, best_score = [], -1.0
+    extractors = get_extractor_order(backends)
+    if not extractors:
+        logger.error("No PDF extraction backend installed. Install with: pip install PyMuPDF")
+
+    for extractor in extractors:
+        try:
+            pages = limit_page_text(extract_pages_bounded(extractor, source))
+        except Exception as e:
+            logger.warning(f"PDF backend {extractor.name} failed: {e}")
+            continue
+
+        text = "\n".join(pages)
+        if not is_garbled(text):
+            logger.info(f"Extracted text using {extractor.name}")
+            best_pages = pages
+            break
+
+        score = text_quality(text) * min(1.0, len(text.strip()) / config.PDF_MIN_TEXT_CHARS)
+        logger.info(f"PDF backend {extractor.name} returned low quality text (score {score:.2f}), trying next")
+        if score > best_score:
+            best_pages, best_score = pages, score
+
+    if not best_pages:
+        return best_pages
+    try:
+        return limit_page_text(fill_textless_pages(source, best_pages))
+    except Exception as e:
+        logger.warning(f"OCR of pages without a text layer failed: {e}")
+        return best_pages
+
+
+_http_session = None
+_http_session_pid = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Shared keep-alive session for resume downloads.
+
+    Reusing one session keeps TLS connections to the file host (Cloudinary)
+    open between resumes. A new session is built after a fork so worker
+    processes never share sockets with their parent.
+    """
+    global _http_session, _http_session_pid
+
+    if _http_session is None or _http_session_pid != os.getpid():
+        with _http_session_lock:
+            if _http_session is None or _http_session_pid != os.getpid():
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=config.HTTP_POOL_SIZE,
+                    pool_maxsize=config.HTTP_POOL_SIZE,
+                    max_retries=Retry(total=3, backoff_factor=0.5,
+                                      status_forcelist=[502, 503, 504], allowed_methods=["GET"])
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _http_session, _http_session_pid = session, os.getpid()
+
+    return _http_session
+
+
+@contextmanager
+def download_pdf(url: str):
+    """
+    Stream a PDF from a URL into memory.
+
+    Yields the PDF bytes, or the path of a temporary file if the download
+    grew past config.PDF_SPOOL_MAX_BYTES; the temporary file is removed on
+    exit. Downloads larger than config.PDF_MAX_DOWNLOAD_BYTES are refused.
+    """
+    buffer = BytesIO()
+    spill_file = None
+    size = 0
+
+    with get_http_session().get(
+            url, stream=True, timeout=(config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT)
+    ) as response:
+        response.raise_for_status()
+
+        declared_size = int(response.headers.get("Content-Length") or 0)
+        if declared_size > config.PDF_MAX_DOWNLOAD_BYTES:
+            raise ValueError(f"PDF too large: {declared_size} bytes (limit {config.PDF_MAX_DOWNLOAD_BYTES})")
+
+        try:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                if size > config.PDF_MAX_DOWNLOAD_BYTES:
+                    raise ValueError(f"PDF exceeds download limit of {config.PDF_MAX_DOWNLOAD_BYTES} bytes")
+
+                if spill_file is None and size > config.PDF_SPOOL_MAX_BYTES:
+                    spill_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+                    spill_file.write(buffer.getbuffer())
+                    buffer = None
+
+                (spill_file if spill_file is not None else buffer).write(chunk)
+        except Exception:
+            if spill_file is not None:
+                spill_file.close()
+                os.remove(spill_file.name)
+            raise
+
+    if spill_file is None:
+        yield buffer.getvalue()
+        return
+
+    spill_file.close()
+    try:
+        yield spill_file.name
+    finally:
+        os.remove(spill_file.name)
+
+
+@contextmanager
+def open_pdf_source(file_path_or_url: str):
+    """Yield something the extractors accept: a local path, or the bytes of a downloaded PDF"""
+    if file_path_or_url.startswith("http://") or file_path_or_url.startswith("https://"):
+        # ✅ Download if it's a URL
+        with download_pdf(file_path_or_url) as source:
+            yield source
+    else:
+        # ✅ Read from local file system (uploads/resumes/...)
+        yield file_path_or_url
+
+
+def extract_text_from_source(source) -> str:
+    return "\n".join(extract_pdf_pages(source)).strip()
+
+
 def extract_text(file_path_or_url: str) -> str:
     try:
-        text = ""
-
-        if file_path_or_url.startswith("http://") or file_path_or_url.startswith("https://"):
-            # ✅ Download if it's a URL
-            response = requests.get(file_path_or_url)
-            response.raise_for_status()
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                tmp_file.write(response.content)
-                tmp_path = tmp_file.name
-            reader = PdfReader(tmp_path)
-            for page in reader.pages:
-                text += page.extract_text() or ""
-            os.remove(tmp_path)
-        else:
-            # ✅ Read from local file system (uploads/resumes/...)
-            reader = PdfReader(file_path_or_url)
-            for page in reader.pages:
-                text += page.extract_text() or ""
-
-        return text.strip()
+        with open_pdf_source(file_path_or_url) as source:
+            return extract_text_from_source(source)
 
     except Exception as e:
         return f"Error extracting text: {e}"
@@ -0,0 +1,195 @@
+"""
+Hybrid resume parsing: rule-based extraction first, LLM only for uncertain fields
+"""
+import logging
+import re
+from typing import Dict, List, Any, Tuple
+import config
+from parse_pdf import extract_sections_with_llm, fallback_phone_extraction, fix_phone_format, LIST_FIELDS
+from section_extractor import section_extractor
+
+logger = logging.getLogger(__name__)
+
+# Fields whose absence or low confidence is worth an LLM call on their own
+REQUIRED_FIELDS = ["name", "email", "phone", "skills", "education", "experience",
+                   "projects", "certifications", "languages"]
+# Fields only re-asked when the LLM is being called anyway
+OPTIONAL_FIELDS = ["location", "summary_or_objective", "linkedin", "github", "portfolio"]
+# Fields found near the top of a resume; a contact-only request sends just the header
+CONTACT_FIELDS = {"name", "email", "phone", "location", "linkedin", "github", "portfolio"}
+
+YEAR_PATTERN = re.compile(r'\b(?:19|20)\d{2}\b')
+# Parts of an education line: "B.S. Computer Science, MIT | 2019", "M.S. at Stanford University"
+EDUCATION_PART_PATTERN = re.compile(r'\s*(?:[,;|\u2013\u2014]|\s-\s|\bat\b)\s*')
+INSTITUTION_PATTERN = re.compile(r'\b(?:university|college|institute|school|academy|polytechnic)\b', re.IGNORECASE)
+DEGREE_WORDS_PATTERN = re.compile(r'\b(?:bachelor|master|phd|doctorate|diploma|b\.?s|m\.?s|b\.?a|m\.?a|b\.?tech|m\.?tech|gpa)\b',
+                                  re.IGNORECASE)
+
+
+def find_institution(line: str) -> str:
+    """The part of an education line that names the institution, or ''"""
+    for part in EDUCATION_PART_PATTERN.split(line):
+        part = YEAR_PATTERN.sub('', part).strip(' ()')
+        if part and INSTITUTION_PATTERN.search(part) and not DEGREE_WORDS_PATTERN.search(part):
+            return part
+    return ''
+
+
+class HybridResumeParser:
+    """
+    Parses resumes locally with SectionExtractor and scores each field.
+
+    Fields scoring below the confidence threshold are re-extracted by the
+    LLM with a prompt that lists only those fields, so most resumes never
+    leave the process and the rest cost a fraction of a full parse.
+    """
+
+    def __init__(self, extractor=None, threshold: float = None):
+        self.extractor = extractor or section_extractor
+        self.threshold = config.HYBRID_CONFIDENCE_THRESHOLD if threshold is None else threshold
+        self.stats = {'local_only': 0, 'partial_llm': 0, 'llm_fields': 0}
+
+    def parse(self, text: str) -> Dict[str, Any]:
+        """
+        Parse resume text into the same schema as extract_sections_with_llm
+
+        Args:
+            text: Extracted resume text
+
+        Returns:
+            Parsed resume data, plus a 'parser' entry recording per-field
+            confidence and which fields were sent to the LLM
+        """
+        if not config.HYBRID_PARSING_ENABLED:
+            return extract_sections_with_llm(text)
+
+        parsed, confidence = self.extract_local(text)
+        llm_fields = self.fields_for_llm(confidence)
+
+        if llm_fields:
+            self.stats['partial_llm'] += 1
+            self.stats['llm_fields'] += len(llm_fields)
+            logger.info(f"Sending low-confidence fields to LLM: {llm_fields}")
+
+            llm_text = text[:config.HYBRID_CONTACT_CHARS] if set(llm_fields) <= CONTACT_FIELDS else text
+            try:
+                llm_result = extract_sections_with_llm(llm_text, llm_fields)
+            except Exception as e:
+                logger.error(f"LLM fallback failed, keeping local results: {e}")
+                llm_result = {"error": str(e)}
+
+            if "error" in llm_result:
+                logger.warning(f"LLM fallback returned no usable data: {llm_result.get('details', llm_result['error'])}")
+            else:
+                for field in llm_fields:
+                    value = llm_result.get(field)
+                    if value not in (None, "", []):
+                        parsed[field] = value
+        else:
+            self.stats['local_only'] += 1
+
+        parsed['parser'] = {
+            'llm_fields': llm_fields,
+            'confidence': {field: round(score, 2) for field, score in confidence.items()}
+        }
+        return parsed
+
+    def fields_for_llm(self, confidence: Dict[str, float]) -> List[str]:
+        uncertain = [field for field in REQUIRED_FIELDS if confidence[field] < self.threshold]
+        if not uncertain:
+            return []
+        return uncertain + [field for field in OPTIONAL_FIELDS if confidence[field] < self.threshold]
+
+    def extract_local(self, text: str) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """Run the rule-based extractor and score every field between 0 and 1"""
+        extractor = self.extractor
+        text_lower = text.lower()
+        parsed: Dict[str, Any] = {}
+        confidence: Dict[str, float] = {}
+
+        contact = extractor.extract_contact_info(text)
+
+        # Name: a header line is more reliable than an NER hit further down
+        parsed['name'] = contact['name'] or None
+        header_lines = [line.strip() for line in text.split('\n')[:5]]
+        if not contact['name']:
+            confidence['name'] = 0.0
+        else:
+            confidence['name'] = 0.9 if contact['name'] in header_lines else 0.7
+
+        parsed['email'] = contact['email'] or None
+        confidence['email'] = 0.95 if contact['email'] else (0.8 if '@' not in text else 0.2)
+
+        phone = fix_phone_format(contact['phone'] or fallback_phone_extraction(text))
+        parsed['phone'] = phone
+        confidence['phone'] = 0.85 if phone and 10 <= len(phone) <= 13 else 0.0
+
+        parsed['location'] = None
+        confidence['location'] = 0.0
+
+        for field in ('linkedin', 'github'):
+            parsed[field] = contact[field] or None
+            if contact[field]:
+                confidence[field] = 0.95
+            else:
+                confidence[field] = 0.9 if field not in text_lower else 0.3
+
+        parsed['portfolio'] = None
+        confidence['portfolio'] = 0.9 if 'portfolio' not in text_lower else 0.3
+
+        summary_section = extractor.find_section(text, 'summary')
+        parsed['summary_or_objective'] = extractor.extract_summary(text) or None
+        confidence['summary_or_objective'] = 0.8 if summary_section else (0.4 if parsed['summary_or_objective'] else 0.0)
+
+        skills = extractor.extract_skills(text)
+        parsed['skills'] = skills
+        if len(skills) >= 3:
+            confidence['skills'] = 0.85 if extractor.find_section(text, 'skills') else 0.6
+        else:
+            confidence['skills'] = 0.3 if skills else 0.0
+
+        education_section = extractor.find_section(text, 'education')
+        education = [
+            {
+                'institution': find_institution(entry['degree']),
+                'degree': entry['degree'],
+                'year': (YEAR_PATTERN.findall(entry['degree']) or [None])[-1]
+            }
+            for entry in extractor.extract_education(text)
+        ]
+        parsed['education'] = education
+        if education:
+            # An entry without an institution would lose data the LLM can recover
+            complete = all(entry['year'] and entry['institution'] for entry in education)
+            confidence['education'] = 0.7 if complete else 0.5
+        else:
+            confidence['education'] = 0.2 if education_section else 0.4
+
+        experience_section = extractor.find_section(text, 'experience')
+        parsed['experience'] = [
+            {'title': entry['title'], 'company': entry['company'], 'years': entry['duration']}
+            for entry in extractor.extract_experience(text)
+        ]
+        if parsed['experience']:
+            confidence['experience'] = 0.75
+        else:
+            # No header at all usually means no experience; an unparsed section needs the LLM
+            confidence['experience'] = 0.2 if experience_section else 0.6
+
+        for field, extract in (('projects', extractor.extract_projects),
+                               ('certifications', extractor.extract_certifications),
+                               ('languages', extractor.extract_languages)):
+            parsed[field] = extract(text)
+            if parsed[field]:
+                confidence[field] = 0.75
+            else:
+                confidence[field] = 0.3 if extractor.find_section(text, field) else 0.7
+
+        for field in LIST_FIELDS:
+            parsed[field] = parsed.get(field) or []
+
+        return parsed, confidence
+
+
+# Global hybrid resume parser instance
+resume_parser = HybridResumeParser()
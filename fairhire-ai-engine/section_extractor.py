@@ -3,35 +3,133 @@ Resume section extraction and parsing using regex and NLP
 """
 import re
 import logging
-from typing import Dict, List, Optional, Any
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Any, Tuple
+from functools import lru_cache
 import spacy
 from collections import defaultdict
 import config
-from utils import clean_text, normalize_skill
+from utils import clean_text, normalize_skills
+from section_worker import extract_sections_chunk, init_worker
+from skill_matcher import skill_matcher
 
 logger = logging.getLogger(__name__)
 
 
+# Header names recognized for each resume section
+SECTION_ALIASES = {
+    'skills': ['skills', 'technical skills', 'core competencies',
+               'technologies', 'programming languages', 'tools'],
+    'experience': ['experience', 'work experience', 'professional experience',
+                   'employment history', 'career history'],
+    'education': ['education', 'academic background', 'qualifications',
+                  'degrees', 'academic qualifications'],
+    'summary': ['summary', 'professional summary', 'objective',
+                'career objective', 'profile', 'about'],
+    'certifications': ['certifications', 'certificates', 'licenses',
+                       'professional certifications', 'credentials'],
+    'projects': ['projects', 'personal projects', 'key projects',
+                 'notable projects', 'portfolio'],
+    'languages': ['languages', 'spoken languages', 'language skills',
+                  'linguistic skills'],
+}
+
+# Headers that close the previous section but are not extracted themselves
+OTHER_SECTION_HEADERS = [
+    'achievements', 'awards', 'honors', 'references', 'interests', 'hobbies',
+    'publications', 'volunteer experience', 'volunteering', 'activities',
+    'extracurricular activities', 'courses', 'trainings', 'contact',
+    'personal information', 'personal details', 'declaration'
+]
+
+ALIAS_TO_SECTION = {alias: section for section, aliases in SECTION_ALIASES.items() for alias in aliases}
+
+
+def _build_header_pattern() -> re.Pattern:
+    """
+    One alternation over every known header, longest first so that
+    "technical skills" wins over "skills". A header must start its line
+    (after an optional bullet) and either end it or be followed by a
+    colon and inline content. Any other "Title Case:" line closes the
+    current section as an unknown header.
+    """
+    headers = sorted(list(ALIAS_TO_SECTION) + OTHER_SECTION_HEADERS, key=len, reverse=True)
+    alternation = "|".join(re.escape(header).replace(r"\ ", r"[ \t]+") for header in headers)
+    return re.compile(
+        rf"^[ \t]*(?:[#*•\-][ \t]*)?"
+        rf"(?:(?i:(?P<header>{alternation}))[ \t]*(?::[ \t]*(?P<inline>[^\n]*?))?"
+        rf"|(?P<other>[A-Z][A-Za-z &/]{{2,40}}):)[ \t\r]*$",
+        re.MULTILINE
+    )
+
+
+HEADER_PATTERN = _build_header_pattern()
+
+
+@lru_cache(maxsize=32)
+def segment_sections(text: str) -> Tuple[Tuple[Optional[str], Optional[str], str], ...]:
+    """
+    Split a resume into sections in a single scan.
+
+    Returns:
+        Tuple of (header alias, section name, content) in document order;
+        section is None for headers outside SECTION_ALIASES, and alias is
+        None too for generic "Title:" lines
+    """
+    matches = list(HEADER_PATTERN.finditer(text))
+    segments = []
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(text)
+        body = text[match.end():end]
+        if match.group('inline'):
+            body = match.group('inline') + "\n" + body
+
+        header = match.group('header')
+        if header:
+            alias = re.sub(r'\s+', ' ', header.lower())
+            segments.append((alias, ALIAS_TO_SECTION.get(alias), body.strip()))
+        else:
+            segments.append((None, None, body.strip()))
+    return tuple(segments)
+
+
 class SectionExtractor:
+    SECTION_ALIASES = SECTION_ALIASES
+
     def __init__(self):
         self.patterns = config.PATTERNS
         self.skill_synonyms = config.SKILL_SYNONYMS
-        self.load_nlp_model()
+        self._nlp = None
+        self._nlp_loaded = False
+
+    @property
+    def nlp(self):
+        """spaCy pipeline, loaded on first use; None if the model is not installed"""
+        if not self._nlp_loaded:
+            self.load_nlp_model()
+        return self._nlp
 
     def load_nlp_model(self):
         """Load spaCy model for NLP processing"""
+        self._nlp_loaded = True
         try:
-            self.nlp = spacy.load("en_core_web_sm")
-            logger.info("Loaded spaCy model successfully")
+            self._nlp = spacy.load(config.SPACY_MODEL, exclude=config.SPACY_EXCLUDE)
+            logger.info(f"Loaded spaCy model {config.SPACY_MODEL} with pipeline {self._nlp.pipe_names}")
+            if self._nlp.pipe_names != ["ner"]:
+                logger.warning(f"spaCy pipeline runs more than NER: {self._nlp.pipe_names}. "
+                               f"Add the extra components to SPACY_EXCLUDE")
         except IOError:
-            logger.warning("spaCy model not found. Install with: python -m spacy download en_core_web_sm")
-            self.nlp = None
+            logger.warning(f"spaCy model not found. Install with: python -m spacy download {config.SPACY_MODEL}")
+            self._nlp = None
 
-    def extract_all_sections(self, text: str) -> Dict[str, Any]:
+    def extract_all_sections(self, text: str, name: str = None) -> Dict[str, Any]:
         """Extract all sections from resume text"""
 
         sections = {
-            'contact_info': self.extract_contact_info(text),
+            'contact_info': self.extract_contact_info(text, name=name),
             'skills': self.extract_skills(text),
             'experience': self.extract_experience(text),
             'education': self.extract_education(text),
@@ -43,8 +141,47 @@ class SectionExtractor:
 
         return sections
 
-    def extract_contact_info(self, text: str) -> Dict[str, str]:
-        """Extract contact information"""
+    def extract_all_sections_batch(self, texts: List[str], batch_size: int = None,
+                                   n_process: int = None) -> List[Dict[str, Any]]:
+        """Extract all sections from many resumes, running spaCy over them in batches"""
+        names = self.extract_names(texts, batch_size=batch_size, n_process=n_process)
+        return [self.extract_all_sections(text, name=name or '') for text, name in zip(texts, names)]
+
+    def extract_many(self, texts: List[str], chunk_size: int = None) -> List[Dict[str, Any]]:
+        """
+        Extract all sections from many resumes across a process pool
+
+        Regex and spaCy work is CPU-bound and holds the GIL, so threads would
+        not help. Resumes are submitted in chunks of chunk_size; each spawned
+        worker loads its own spaCy model once and runs
+        extract_all_sections_batch on its chunks. Small inputs are extracted
+        in-process. Meant for bulk jobs and benchmark.py; the per-resume
+        pipeline goes through resume_parser instead.
+
+        Args:
+            texts: Resume texts
+            chunk_size: Resumes per pool task (default config.SECTION_CHUNK_SIZE)
+
+        Returns:
+            Extracted sections for each text, in input order
+        """
+        global _section_pool
+
+        if len(texts) < config.SECTION_PARALLEL_MIN_TEXTS or config.SECTION_WORKERS < 2:
+            return self.extract_all_sections_batch(texts)
+
+        chunk_size = chunk_size or config.SECTION_CHUNK_SIZE
+        chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+        try:
+            pool = get_section_pool()
+            return [sections for chunk in pool.map(extract_sections_chunk, chunks) for sections in chunk]
+        except BrokenProcessPool as e:
+            logger.warning(f"Section extraction pool failed ({e}), extracting serially")
+            _section_pool = None
+            return self.extract_all_sections_batch(texts)
+
+    def extract_contact_info(self, text: str, name: str = None) -> Dict[str, str]:
+        """Extract contact information; name skips name extraction when already known"""
         contact_info = {
             'name': '',
             'email': '',
@@ -60,9 +197,10 @@ class SectionExtractor:
             contact_info['email'] = email_matches[0].lower()
 
         # Extract phone
-        phone_matches = re.findall(self.patterns['phone'], text)
-        if phone_matches:
-            contact_info['phone'] = phone_matches[0]
+        # search rather than findall: the pattern's country-code group would otherwise be returned
+        phone_match = re.search(self.patterns['phone'], text)
+        if phone_match:
+            contact_info['phone'] = phone_match.group(0).strip()
 
         # Extract LinkedIn
         linkedin_matches = re.findall(self.patterns['linkedin'], text, re.IGNORECASE)
@@ -75,7 +213,8 @@ class SectionExtractor:
             contact_info['github'] = f"https://{github_matches[0]}"
 
         # Extract name (first line or common patterns)
-        name = self.extract_name(text)
+        if name is None:
+            name = self.extract_name(text)
         if name:
             contact_info['name'] = name
 
@@ -83,6 +222,49 @@ class SectionExtractor:
 
     def extract_name(self, text: str) -> Optional[str]:
         """Extract candidate name from resume"""
+        name = self.extract_name_from_header(text)
+        if name:
+            return name
+
+        # Use NLP if available
+        if self.nlp:
+            return self.person_from_doc(self.nlp(text[:config.SPACY_NAME_CHARS]))
+
+        return None
+
+    def extract_names(self, texts: List[str], batch_size: int = None,
+                      n_process: int = None) -> List[Optional[str]]:
+        """
+        Extract candidate names from many resumes
+
+        The header heuristic runs first; only resumes it fails on go through
+        spaCy, together in nlp.pipe batches.
+
+        Args:
+            texts: Resume texts
+            batch_size: Documents per nlp.pipe batch (default config.SPACY_BATCH_SIZE)
+            n_process: spaCy worker processes (default config.SPACY_N_PROCESS)
+
+        Returns:
+            Name or None for each text, in input order
+        """
+        names = [self.extract_name_from_header(text) for text in texts]
+        pending = [index for index, name in enumerate(names) if not name]
+        if not pending or not self.nlp:
+            return names
+
+        docs = self.nlp.pipe(
+            (texts[index][:config.SPACY_NAME_CHARS] for index in pending),
+            batch_size=batch_size or config.SPACY_BATCH_SIZE,
+            n_process=n_process or config.SPACY_N_PROCESS
+        )
+        for index, doc in zip(pending, docs):
+            names[index] = self.person_from_doc(doc)
+        return names
+
+    @staticmethod
+    def extract_name_from_header(text: str) -> Optional[str]:
+        """Return one of the first lines if it looks like a name"""
         lines = text.split('\n')
 
         # Try first few lines
@@ -92,69 +274,29 @@ class SectionExtractor:
                 # Check if it looks like a name
                 if re.match(r'^[A-Z][a-z]+\s+[A-Z][a-z]+', line):
                     return line
+        return None
 
-        # Use NLP if available
-        if self.nlp:
-            doc = self.nlp(text[:500])  # First 500 chars
-            for ent in doc.ents:
-                if ent.label_ == "PERSON":
-                    return ent.text
-
+    @staticmethod
+    def person_from_doc(doc) -> Optional[str]:
+        for ent in doc.ents:
+            if ent.label_ == "PERSON":
+                return ent.text
         return None
 
     def extract_skills(self, text: str) -> List[str]:
         """Extract skills from resume text"""
-        skills = set()
-
-        # Common skill sections
-        skill_sections = [
-            'skills', 'technical skills', 'core competencies',
-            'technologies', 'programming languages', 'tools'
-        ]
-
-        # Look for dedicated skill sections
-        for section in skill_sections:
-            section_content = self.extract_section_content(text, section)
-            if section_content:
-                extracted_skills = self.parse_skills_from_text(section_content)
-                skills.update(extracted_skills)
-
-        # Also extract skills from entire text
-        all_skills = self.parse_skills_from_text(text)
-        skills.update(all_skills)
-
-        # Normalize and clean skills
-        normalized_skills = []
-        for skill in skills:
-            normalized = normalize_skill(skill, self.skill_synonyms)
-            if normalized and len(normalized) > 1:
-                normalized_skills.append(normalized)
-
-        return list(set(normalized_skills))
+        # Skill sections are part of the text, so one pass over the whole text covers them
+        skills = self.parse_skills_from_text(text)
+
+        # Snap near-misses ("nodejs", "postgres sql") onto the taxonomy, then normalize
+        skills = skill_matcher.canonicalize(skills)
+        return [skill for skill in normalize_skills(skills, self.skill_synonyms) if len(skill) > 1]
 
     def parse_skills_from_text(self, text: str) -> List[str]:
         """Parse skills from text using various methods"""
-        skills = set()
-
-        # Common programming languages and technologies
-        tech_keywords = [
-            'python', 'javascript', 'java', 'c++', 'c#', 'php', 'ruby', 'go', 'rust',
-            'react', 'angular', 'vue', 'node.js', 'django', 'flask', 'spring',
-            'html', 'css', 'sass', 'bootstrap', 'tailwind',
-            'mysql', 'postgresql', 'mongodb', 'redis', 'elasticsearch',
-            'aws', 'azure', 'gcp', 'docker', 'kubernetes', 'jenkins',
-            'git', 'github', 'gitlab', 'jira', 'confluence',
-            'machine learning', 'deep learning', 'tensorflow', 'pytorch',
-            'data science', 'pandas', 'numpy', 'scikit-learn',
-            'restful', 'api', 'microservices', 'agile', 'scrum'
-        ]
-
-        text_lower = text.lower()
-
-        # Extract tech keywords
-        for keyword in tech_keywords:
-            if keyword in text_lower:
-                skills.add(keyword)
+        # Known skill terms, matched on word boundaries in one pass. A dict keeps
+        # first-seen order, which (unlike a set's) doesn't depend on the process's hash seed
+        skills = dict.fromkeys(skill_matcher.find(text), True)
 
         # Extract from bullet points and lists
         bullet_pattern = r'[•\-\*]\s*([^\n]+)'
@@ -166,7 +308,7 @@ class SectionExtractor:
             for item in items:
                 clean_item = clean_text(item.strip())
                 if clean_item and len(clean_item) > 1:
-                    skills.add(clean_item.lower())
+                    skills[clean_item.lower()] = True
 
         return list(skills)
 
@@ -175,17 +317,7 @@ class SectionExtractor:
         experience = []
 
         # Look for experience sections
-        exp_sections = [
-            'experience', 'work experience', 'professional experience',
-            'employment history', 'career history'
-        ]
-
-        exp_content = None
-        for section in exp_sections:
-            content = self.extract_section_content(text, section)
-            if content:
-                exp_content = content
-                break
+        exp_content = self.find_section(text, 'experience')
 
         if not exp_content:
             return experience
@@ -212,17 +344,7 @@ class SectionExtractor:
         education = []
 
         # Look for education sections
-        edu_sections = [
-            'education', 'academic background', 'qualifications',
-            'degrees', 'academic qualifications'
-        ]
-
-        edu_content = None
-        for section in edu_sections:
-            content = self.extract_section_content(text, section)
-            if content:
-                edu_content = content
-                break
+        edu_content = self.find_section(text, 'education')
 
         if not edu_content:
             return education
@@ -244,15 +366,9 @@ class SectionExtractor:
 
     def extract_summary(self, text: str) -> str:
         """Extract professional summary"""
-        summary_sections = [
-            'summary', 'professional summary', 'objective',
-            'career objective', 'profile', 'about'
-        ]
-
-        for section in summary_sections:
-            content = self.extract_section_content(text, section)
-            if content:
-                return content.strip()
+        content = self.find_section(text, 'summary')
+        if content:
+            return content.strip()
 
         # If no dedicated section, use first paragraph
         lines = text.split('\n')
@@ -266,20 +382,14 @@ class SectionExtractor:
         """Extract certifications"""
         certifications = []
 
-        cert_sections = [
-            'certifications', 'certificates', 'licenses',
-            'professional certifications', 'credentials'
-        ]
-
-        for section in cert_sections:
-            content = self.extract_section_content(text, section)
-            if content:
-                # Split by lines and clean
-                lines = content.split('\n')
-                for line in lines:
-                    clean_line = line.strip()
-                    if clean_line and len(clean_line) > 3:
-                        certifications.append(clean_line)
+        content = self.find_section(text, 'certifications')
+        if content:
+            # Split by lines and clean
+            lines = content.split('\n')
+            for line in lines:
+                clean_line = line.strip()
+                if clean_line and len(clean_line) > 3:
+                    certifications.append(clean_line)
 
         return certifications
 
@@ -287,23 +397,17 @@ class SectionExtractor:
         """Extract project information"""
         projects = []
 
-        project_sections = [
-            'projects', 'personal projects', 'key projects',
-            'notable projects', 'portfolio'
-        ]
-
-        for section in project_sections:
-            content = self.extract_section_content(text, section)
-            if content:
-                # Simple project parsing
-                lines = content.split('\n')
-                for line in lines:
-                    if line.strip() and len(line.strip()) > 10:
-                        projects.append({
-                            'name': line.strip(),
-                            'description': '',
-                            'technologies': []
-                        })
+        content = self.find_section(text, 'projects')
+        if content:
+            # Simple project parsing
+            lines = content.split('\n')
+            for line in lines:
+                if line.strip() and len(line.strip()) > 10:
+                    projects.append({
+                        'name': line.strip(),
+                        'description': '',
+                        'technologies': []
+                    })
 
         return projects
 
@@ -311,45 +415,52 @@ class SectionExtractor:
         """Extract spoken languages"""
         languages = []
 
-        lang_sections = [
-            'languages', 'spoken languages', 'language skills',
-            'linguistic skills'
-        ]
-
-        for section in lang_sections:
-            content = self.extract_section_content(text, section)
-            if content:
-                # Common languages
-                common_languages = [
-                    'english', 'spanish', 'french', 'german', 'chinese',
-                    'japanese', 'korean', 'italian', 'portuguese', 'russian',
-                    'arabic', 'hindi', 'bengali', 'urdu', 'turkish'
-                ]
-
-                content_lower = content.lower()
-                for lang in common_languages:
-                    if lang in content_lower:
-                        languages.append(lang.capitalize())
+        content = self.find_section(text, 'languages')
+        if content:
+            # Common languages
+            common_languages = [
+                'english', 'spanish', 'french', 'german', 'chinese',
+                'japanese', 'korean', 'italian', 'portuguese', 'russian',
+                'arabic', 'hindi', 'bengali', 'urdu', 'turkish'
+            ]
 
-        return languages
+            content_lower = content.lower()
+            for lang in common_languages:
+                if lang in content_lower:
+                    languages.append(lang.capitalize())
 
-    def extract_section_content(self, text: str, section_name: str) -> Optional[str]:
-        """
-        Tries multiple patterns to robustly extract the content of a section.
-        """
-        section_variants = [
-            rf'{section_name}\s*:?[\n\r]+(.*?)(?=\n[A-Z][A-Za-z\s]{{2,}}:|\n\n|\Z)',  # Standard
-            rf'{section_name.upper()}(.*?)(?=\n[A-Z][A-Za-z\s]{{2,}}:|\n\n|\Z)',  # UPPERCASE headers
-            rf'{section_name.capitalize()}(.*?)(?=\n[A-Z][A-Za-z\s]{{2,}}:|\n\n|\Z)'  # Capitalized
-        ]
+        return languages
 
-        for pattern in section_variants:
-            match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
-            if match:
-                return match.group(1).strip()
+    def find_section(self, text: str, section: str) -> Optional[str]:
+        """Return the combined content of every header belonging to a section, if any"""
+        contents = [content for _, name, content in segment_sections(text) if name == section and content]
+        return "\n".join(contents) if contents else None
 
+    def extract_section_content(self, text: str, section_name: str) -> Optional[str]:
+        """Return the content under a specific header name, e.g. 'technical skills'"""
+        section_name = section_name.lower()
+        for alias, _, content in segment_sections(text):
+            if alias == section_name and content:
+                return content
         return None
 
 
 # Global section extractor instance
-section_extractor = SectionExtractor()
\ No newline at end of file
+section_extractor = SectionExtractor()
+
+
+_section_pool = None
+_section_pool_lock = threading.Lock()
+
+
+def get_section_pool() -> ProcessPoolExecutor:
+    global _section_pool
+    if _section_pool is None:
+        with _section_pool_lock:
+            if _section_pool is None:
+                # spawn, not fork: the parent may already hold torch, the Mongo client and
+                # thread pools. Workers run section_worker, which loads only the extractor
+                _section_pool = ProcessPoolExecutor(max_workers=config.SECTION_WORKERS,
+                                                    mp_context=multiprocessing.get_context("spawn"),
+                                                    initializer=init_worker)
+    return _section_pool
\ No newline at end of file
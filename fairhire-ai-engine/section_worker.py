@@ -0,0 +1,21 @@
+"""
+Section extraction pool workers
+
+Kept apart from the pipeline so a spawned pool worker imports only the
+section extractor (spaCy, regexes and the skill taxonomy), never the
+database, embedding model, Presidio or Groq.
+"""
+from typing import Any, Dict, List
+
+
+def init_worker():
+    """Process pool initializer: load the spaCy model once per worker"""
+    from section_extractor import section_extractor
+    section_extractor.nlp
+
+
+def extract_sections_chunk(texts: List[str]) -> List[Dict[str, Any]]:
+    """Process pool entry point: extract one chunk of resumes"""
+    from section_extractor import section_extractor
+    # Workers are daemonic and cannot start spaCy processes of their own
+    return section_extractor.extract_all_sections_batch(texts, n_process=1)
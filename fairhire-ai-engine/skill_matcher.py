@@ -0,0 +1,187 @@
+"""
+Dictionary-based skill detection with a compiled token trie
+"""
+import logging
+import os
+import re
+from typing import Dict, List, Iterable, Optional
+import config
+from utils import fuzzy_match_many
+
+logger = logging.getLogger(__name__)
+
+# Tokens keep the symbols that are part of skill names: c++, c#, node.js, scikit-learn
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#.\-]*[a-z0-9+#]|[a-z0-9][+#]*")
+# Where an unknown token is split into sub-tokens: react.js, front-end
+SUB_TOKEN_PATTERN = re.compile(r"[.\-]")
+TRAILING_DIGITS_PATTERN = re.compile(r"(?<=[a-z])\d+$")
+
+# Marks the end of a term in the trie; the value is the canonical skill name
+_TERM_END = ""
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def load_taxonomy_file(path: str) -> Dict[str, str]:
+    """
+    Read extra skills from a text file, one per line:
+
+        kubernetes
+        javascript: js, ecmascript
+
+    Returns:
+        Mapping of every term (canonical names and aliases) to its canonical name
+    """
+    terms = {}
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            canonical, _, aliases = line.partition(':')
+            canonical = canonical.strip().lower()
+            terms[canonical] = canonical
+            for alias in aliases.split(','):
+                if alias.strip():
+                    terms[alias.strip().lower()] = canonical
+    return terms
+
+
+class SkillMatcher:
+    """
+    Finds every known skill term in a text in one pass over its tokens.
+
+    Terms (single or multi-word) are compiled into a trie keyed by token,
+    so matching walks each token position once and only follows the trie
+    as far as a term continues. Matches always fall on token boundaries,
+    so "go" is not found inside "google" and "java" not inside "javascript".
+    """
+
+    def __init__(self, terms: Optional[Dict[str, str]] = None):
+        self.trie: Dict[str, dict] = {}
+        self.term_count = 0
+        self.vocabulary: Dict[str, str] = {}
+        self._vocabulary_terms: List[str] = []
+        self._canonical_cache: Dict[str, str] = {}
+        self.add_terms(terms if terms is not None else self.default_terms())
+
+    @staticmethod
+    def default_terms() -> Dict[str, str]:
+        """config.SKILL_TAXONOMY plus SKILL_SYNONYMS aliases, plus the optional taxonomy file"""
+        terms = {skill: skill for skill in config.SKILL_TAXONOMY}
+        for alias, canonical in config.SKILL_SYNONYMS.items():
+            terms.setdefault(canonical, canonical)
+            terms[alias] = alias
+
+        if config.SKILL_TAXONOMY_FILE and os.path.exists(config.SKILL_TAXONOMY_FILE):
+            try:
+                terms.update(load_taxonomy_file(config.SKILL_TAXONOMY_FILE))
+            except Exception as e:
+                logger.error(f"Error loading skill taxonomy {config.SKILL_TAXONOMY_FILE}: {e}")
+
+        for excluded in config.SKILL_TERMS_EXCLUDED:
+            terms.pop(excluded, None)
+        return terms
+
+    def add_terms(self, terms: Dict[str, str]):
+        for term, canonical in terms.items():
+            tokens = tokenize(term)
+            if not tokens:
+                continue
+            node = self.trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            if _TERM_END not in node:
+                self.term_count += 1
+            node[_TERM_END] = canonical
+            self.vocabulary[term] = canonical
+
+        self._vocabulary_terms = list(self.vocabulary)
+        self._canonical_cache.clear()
+
+    def _term_variant(self, token: str) -> str:
+        """A trie token for a sub-token like python3 or apis, or the sub-token itself"""
+        if token in self.trie:
+            return token
+        for variant in (TRAILING_DIGITS_PATTERN.sub("", token),
+                        token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token):
+            if variant in self.trie:
+                return variant
+        return token
+
+    def match_tokens(self, text: str) -> List[str]:
+        """
+        Tokenize text for matching
+
+        Tokens that aren't a known term are split on "." and "-" (with a
+        ".js" suffix dropped), and each piece is reduced to a known term by
+        removing trailing digits or a plural "s": "React.js" gives react,
+        "Python3" python and "APIs" api.
+        """
+        tokens = []
+        for token in tokenize(text):
+            if token in self.trie:
+                tokens.append(token)
+                continue
+            if token.endswith(".js") and len(token) > 3:
+                token = token[:-3]
+            tokens.extend(self._term_variant(part) for part in SUB_TOKEN_PATTERN.split(token) if part)
+        return tokens
+
+    def find(self, text: str) -> List[str]:
+        """Return the distinct terms found in text, longest match at each position"""
+        tokens = self.match_tokens(text)
+        found = {}
+        trie = self.trie
+
+        for start in range(len(tokens)):
+            node = trie.get(tokens[start])
+            if node is None:
+                continue
+            match = node.get(_TERM_END)
+            position = start + 1
+            while position < len(tokens):
+                node = node.get(tokens[position])
+                if node is None:
+                    break
+                match = node.get(_TERM_END, match)
+                position += 1
+            if match is not None:
+                found[match] = True
+
+        return list(found)
+
+    def canonicalize(self, skills: List[str]) -> List[str]:
+        """
+        Map noisy skill strings onto the vocabulary
+
+        Skills not seen before are fuzzy-matched against every vocabulary term
+        in one fuzzy_match_many call; results are cached per string.
+
+        Args:
+            skills: Extracted skill strings
+
+        Returns:
+            For each skill, the canonical name of the closest term scoring at
+            least config.SKILL_FUZZY_CUTOFF, or the skill itself
+        """
+        cache = self._canonical_cache
+        pending = list({skill: True for skill in skills if skill not in cache})
+
+        if pending:
+            if len(cache) + len(pending) > config.SKILL_FUZZY_CACHE_SIZE:
+                cache.clear()
+            terms = self._vocabulary_terms
+            for skill, index in zip(pending, fuzzy_match_many(pending, terms, config.SKILL_FUZZY_CUTOFF)):
+                cache[skill] = self.vocabulary[terms[index]] if index is not None else skill
+
+        return [cache.get(skill, skill) for skill in skills]
+
+    def find_all(self, texts: Iterable[str]) -> List[List[str]]:
+        return [self.find(text) for text in texts]
+
+
+# Global skill matcher instance
+skill_matcher = SkillMatcher()
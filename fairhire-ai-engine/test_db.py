@@ -25,7 +25,6 @@
 #     print(f"🔹 {name}")
 import os
 from dotenv import load_dotenv
-from pymongo import MongoClient
 from bson import ObjectId
 from datetime import datetime
 
@@ -38,9 +37,10 @@ MONGO_URI = os.getenv("MONGODB_URI")
 if not MONGO_URI:
     raise ValueError("❌ MONGO_URI not found in .env file")
 
-# ✅ Connect to Atlas DB
-client = MongoClient(MONGO_URI)
-db = client["test"]  # Or whatever your DB name is on Atlas
+# ✅ Reuse the engine's shared connection pool instead of opening a second client
+from mongo_pool import mongo_pool
+
+db = mongo_pool.get_database("test")  # Or whatever your DB name is on Atlas
 
 # 🎯 Dummy match document
 match_doc = {
@@ -0,0 +1,49 @@
+from unittest import mock
+
+import pytest
+
+import main
+
+PARSED = {'name': 'Jane Doe', 'email': 'jane@example.com', 'skills': ['python']}
+MASKED = {'name': '[NAME]', 'email': '[EMAIL]', 'skills': ['python']}
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    components = {
+        'db_manager': mock.MagicMock(),
+        'text_cache': mock.MagicMock(),
+        'resume_parser': mock.MagicMock(),
+        'embedding_generator': mock.MagicMock(),
+        'job_matcher': mock.MagicMock(),
+        'pii_anonymizer': mock.MagicMock(),
+    }
+    components['text_cache'].get_text.return_value = ("resume text", "sha")
+    components['resume_parser'].parse.return_value = PARSED
+    components['embedding_generator'].generate_resume_embeddings.return_value = None
+    components['pii_anonymizer'].anonymize_resume.return_value = MASKED
+    for name, component in components.items():
+        monkeypatch.setattr(main, name, component)
+    return main.AIEnginePipeline(), components
+
+
+def test_flagged_resume_is_stored_anonymized(pipeline):
+    engine, components = pipeline
+    db = components['db_manager']
+    db.get_resume_by_id.return_value = {'_id': 'r1', 'file_path': 'r1.pdf', 'anonymize': True}
+
+    assert engine.process_single_resume('r1')
+
+    components['pii_anonymizer'].anonymize_resume.assert_called_once_with(PARSED)
+    assert db.update_resume_status.call_args_list[-1] == mock.call('r1', "processed", MASKED)
+
+
+def test_unflagged_resume_keeps_parsed_data(pipeline):
+    engine, components = pipeline
+    db = components['db_manager']
+    db.get_resume_by_id.return_value = {'_id': 'r1', 'file_path': 'r1.pdf'}
+
+    assert engine.process_single_resume('r1')
+
+    components['pii_anonymizer'].anonymize_resume.assert_not_called()
+    db.update_resume_status.assert_called_once_with('r1', "processed", PARSED)
@@ -0,0 +1,34 @@
+from skill_matcher import SkillMatcher
+
+TERMS = {
+    'python': 'python', 'react': 'react', 'vue': 'vue', 'node.js': 'node.js', 'go': 'go',
+    'java': 'java', 'scikit-learn': 'scikit-learn', 'api': 'api', 'rest api': 'rest api', 'css': 'css'
+}
+
+
+def test_js_suffixed_frameworks_match_their_terms():
+    found = SkillMatcher(TERMS).find("Built SPAs with React.js, Vue.js and Express.js")
+    assert 'react' in found
+    assert 'vue' in found
+
+
+def test_trailing_version_digits_are_ignored():
+    assert SkillMatcher(TERMS).find("Scripting in Python3") == ['python']
+
+
+def test_plural_matches_singular_term():
+    found = SkillMatcher(TERMS).find("Designed REST APIs")
+    assert 'rest api' in found
+    assert 'api' in found
+
+
+def test_known_dotted_and_hyphenated_terms_stay_whole():
+    assert SkillMatcher(TERMS).find("node.js and scikit-learn") == ['node.js', 'scikit-learn']
+
+
+def test_plural_s_is_not_stripped_from_short_or_double_s_words():
+    assert SkillMatcher(TERMS).find("CSS, class") == ['css']
+
+
+def test_matches_stay_on_token_boundaries():
+    assert SkillMatcher(TERMS).find("django, google, javascript") == []
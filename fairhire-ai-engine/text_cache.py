@@ -0,0 +1,106 @@
+"""
+Content-addressed cache of text extracted from resume PDFs
+"""
+import hashlib
+import logging
+import zlib
+from typing import Optional, Tuple
+from bson import Binary
+from db import db_manager
+from parse_pdf import EXTRACTOR_VERSION, extract_text_from_source, extraction_settings_digest, open_pdf_source
+
+logger = logging.getLogger(__name__)
+
+
+def sha256_of_source(source) -> str:
+    """SHA-256 of a PDF given as bytes or as a local file path"""
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    else:
+        with open(source, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractedTextCache:
+    """
+    Stores extracted resume text zlib-compressed in MongoDB.
+
+    Entries are keyed by the PDF's SHA-256 plus a digest of the extraction
+    settings (extractor version, backends, page/character caps, OCR
+    availability), so duplicate uploads share one entry and text extracted
+    under other settings, e.g. truncated or without OCR, is re-extracted.
+    """
+
+    def __init__(self, compression_level: int = 6):
+        self.compression_level = compression_level
+        self.stats = {'hits': 0, 'misses': 0}
+
+    @staticmethod
+    def cache_key(file_sha256: str) -> str:
+        return f"{file_sha256}:{extraction_settings_digest()}"
+
+    def get(self, file_sha256: str) -> Optional[str]:
+        document = db_manager.get_extracted_text(self.cache_key(file_sha256))
+        if not document:
+            return None
+        try:
+            return zlib.decompress(document['text']).decode('utf-8')
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cached text for {file_sha256}: {e}")
+            return None
+
+    def put(self, file_sha256: str, text: str):
+        raw = text.encode('utf-8')
+        db_manager.save_extracted_text(self.cache_key(file_sha256), {
+            'sha256': file_sha256,
+            'extractor_version': EXTRACTOR_VERSION,
+            'extraction_settings': extraction_settings_digest(),
+            'text': Binary(zlib.compress(raw, self.compression_level)),
+            'length': len(raw)
+        })
+
+    def get_text(self, file_path_or_url: str, known_sha256: str = None) -> Tuple[str, Optional[str]]:
+        """
+        Return the text of a resume PDF, extracting it only on a cache miss
+
+        Args:
+            file_path_or_url: Local path or http(s) URL of the PDF
+            known_sha256: Hash recorded for this file earlier; lets a
+                reprocess skip reading the PDF entirely
+
+        Returns:
+            Tuple of (extracted text or "" on failure, SHA-256 of the PDF)
+        """
+        if known_sha256:
+            text = self.get(known_sha256)
+            if text is not None:
+                self.stats['hits'] += 1
+                return text, known_sha256
+
+        try:
+            with open_pdf_source(file_path_or_url) as source:
+                file_sha256 = sha256_of_source(source)
+
+                text = self.get(file_sha256)
+                if text is not None:
+                    self.stats['hits'] += 1
+                    logger.info(f"Using cached text for {file_path_or_url}")
+                    return text, file_sha256
+
+                self.stats['misses'] += 1
+                text = extract_text_from_source(source)
+
+            if text:
+                self.put(file_sha256, text)
+            return text, file_sha256
+
+        except Exception as e:
+            logger.error(f"Error extracting text from {file_path_or_url}: {e}")
+            return "", None
+
+
+# Global extracted text cache instance
+text_cache = ExtractedTextCache()
@@ -3,12 +3,24 @@ Utility functions for text processing and data cleaning
 """
 import re
 import logging
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, Iterator, Optional
 import unicodedata
 import string
 
 logger = logging.getLogger(__name__)
 
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# Anything but word characters, whitespace and basic punctuation
+SPECIAL_CHARS_PATTERN = re.compile(r'[^\w\s\-.,!?@]')
+
+# The same filter as a translate table, for ASCII text
+_KEPT_ASCII = set(string.ascii_letters + string.digits + '_-.,!?@')
+SPECIAL_CHARS_TABLE = {
+    code: None for code in range(128)
+    if chr(code) not in _KEPT_ASCII and not chr(code).isspace()
+}
+
 
 def clean_text(text: str) -> str:
     """
@@ -23,11 +35,15 @@ def clean_text(text: str) -> str:
     if not text:
         return ""
 
+    # ASCII text (nearly every skill token) is unchanged by NFKD and can use the translate table
+    if text.isascii():
+        return ' '.join(text.split()).translate(SPECIAL_CHARS_TABLE).strip()
+
     # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text)
+    text = WHITESPACE_PATTERN.sub(' ', text)
 
     # Remove special characters (keep basic punctuation)
-    text = re.sub(r'[^\w\s\-.,!?@]', '', text)
+    text = SPECIAL_CHARS_PATTERN.sub('', text)
 
     # Normalize unicode
     text = unicodedata.normalize('NFKD', text)
@@ -52,13 +68,37 @@ def normalize_skill(skill: str, synonym_dict: Dict[str, str]) -> str:
     if not skill:
         return ""
 
-    # Clean and lowercase
-    normalized = clean_text(skill.lower())
-
     # Check for synonyms
+    normalized = _clean_skill(skill)
     return synonym_dict.get(normalized, normalized)
 
 
+@lru_cache(maxsize=8192)
+def _clean_skill(skill: str) -> str:
+    # Clean and lowercase; resumes repeat the same few hundred skills
+    return clean_text(skill.lower())
+
+
+def normalize_skills(skills: List[str], synonym_dict: Dict[str, str]) -> List[str]:
+    """
+    Normalize many skill names at once
+
+    Args:
+        skills: Skill names to normalize
+        synonym_dict: Dictionary of synonyms
+
+    Returns:
+        Distinct non-empty normalized skills, in first-seen order
+    """
+    normalized = {}
+    for skill in skills:
+        if skill:
+            cleaned = _clean_skill(skill)
+            normalized[synonym_dict.get(cleaned, cleaned)] = True
+    normalized.pop("", None)
+    return list(normalized)
+
+
 def extract_urls(text: str) -> List[str]:
     """
     Extract URLs from text
@@ -238,23 +278,62 @@ def chunk_text(text: str, max_length: int = 1000, overlap: int = 100) -> List[st
     if len(text) <= max_length:
         return [text]
 
-    chunks = []
-    start = 0
+    return list(iter_chunks(text, max_length, overlap))
+
+
+def iter_chunks(text: str, max_length: int = 1000, overlap: int = 100,
+                tokenizer=None, separator: str = ' ') -> Iterator[str]:
+    """
+    Lazily split text into overlapping chunks
+
+    Every chunk starts after the previous one ends minus the overlap, and
+    always after the previous one starts, so the generator terminates. With overlap 0 and no tokenizer, the chunks concatenate
+    back to the original text.
 
+    Args:
+        text: Input text to chunk
+        max_length: Maximum chunk length, in characters or in tokenizer tokens
+        overlap: Characters (or tokens) repeated at the start of the next chunk
+        tokenizer: Hugging Face fast tokenizer; when given, lengths count tokens
+        separator: Preferred break point for character chunks
+
+    Yields:
+        Text chunks in document order
+    """
+    if overlap >= max_length:
+        raise ValueError(f"overlap ({overlap}) must be smaller than max_length ({max_length})")
+
+    if tokenizer is not None:
+        yield from _iter_token_chunks(text, max_length, overlap, tokenizer)
+        return
+
+    start = 0
     while start < len(text):
         end = start + max_length
 
         # Try to break at word boundary
         if end < len(text):
-            # Find last space before max_length
-            last_space = text.rfind(' ', start, end)
-            if last_space > start:
-                end = last_space
+            last_break = text.rfind(separator, start, end)
+            if last_break > start:
+                end = last_break
+
+        yield text[start:end]
+        if end >= len(text):
+            break
+        # A chunk shorter than the overlap (cut at an early break) is not overlapped
+        start = end - overlap if end - overlap > start else end
+
 
-        chunks.append(text[start:end])
-        start = end - overlap
+def _iter_token_chunks(text: str, max_tokens: int, overlap: int, tokenizer) -> Iterator[str]:
+    # Offsets map each token back to its characters, so chunks are slices of the original text
+    offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True,
+                        verbose=False)['offset_mapping']
 
-    return chunks
+    for start in range(0, len(offsets), max_tokens - overlap):
+        window = offsets[start:start + max_tokens]
+        yield text[window[0][0]:window[-1][1]]
+        if start + max_tokens >= len(offsets):
+            break
 
 
 def detect_language(text: str) -> str:
@@ -352,6 +431,35 @@ def fuzzy_match(text1: str, text2: str, threshold: float = 0.8) -> bool:
         return text1.lower() == text2.lower()
 
 
+def fuzzy_match_many(queries: List[str], choices: List[str], threshold: float = 0.8) -> List[Optional[int]]:
+    """
+    Find the best fuzzy match for every query in one vectorized call
+
+    Args:
+        queries: Texts to match
+        choices: Candidate texts
+        threshold: Similarity threshold
+
+    Returns:
+        Index into choices of the best match at or above threshold, or None, for each query
+    """
+    if not queries or not choices:
+        return [None] * len(queries)
+
+    queries = [query.lower() for query in queries]
+    choices = [choice.lower() for choice in choices]
+    try:
+        from rapidfuzz import fuzz, process
+        # Scores below the cutoff come back as 0
+        scores = process.cdist(queries, choices, scorer=fuzz.ratio, score_cutoff=threshold * 100, workers=-1)
+        best = scores.argmax(axis=1)
+        return [int(index) if scores[row, index] > 0 else None for row, index in enumerate(best)]
+    except ImportError:
+        logger.warning("rapidfuzz not installed. Using simple string comparison.")
+        positions = {choice: index for index, choice in reversed(list(enumerate(choices)))}
+        return [positions.get(query) for query in queries]
+
+
 def sanitize_filename(filename: str) -> str:
     """
     Sanitize filename for safe storage
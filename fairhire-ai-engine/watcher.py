@@ -0,0 +1,204 @@
+"""
+Change-stream driven ingestion of new resumes and job updates
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from pymongo.errors import OperationFailure, PyMongoError
+from db import db_manager
+import config
+
+logger = logging.getLogger(__name__)
+
+# Server error code returned when change streams are used on a standalone mongod
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+RESUME_TASK = "resume"
+JOBS_TASK = "jobs"
+
+
+class ChangeStreamWatcher:
+    """
+    Subscribes to change streams on the resumes and jobs collections.
+
+    New or reset resumes with status "pending" are queued for processing
+    as soon as they are written; edited jobs are marked dirty so their
+    embeddings are regenerated. A single worker thread drains the queue
+    through the pipeline, so processing stays serialized.
+    """
+
+    def __init__(self, pipeline, max_await_ms: int = None):
+        self.pipeline = pipeline
+        self.max_await_ms = max_await_ms or config.WATCHER_MAX_AWAIT_MS
+        self.tasks = queue.Queue()
+        self.stop_event = threading.Event()
+        self._queued_resumes = set()
+        self._queued_lock = threading.Lock()
+        self._jobs_refresh_pending = threading.Event()
+        self._resume_tokens: Dict[str, Any] = {}
+        self._threads: List[threading.Thread] = []
+        self.stats = {
+            'resumes_queued': 0,
+            'jobs_marked_dirty': 0,
+            'events_seen': 0
+        }
+
+    # Queueing
+    def enqueue_resume(self, resume_id: str):
+        with self._queued_lock:
+            if resume_id in self._queued_resumes:
+                return
+            self._queued_resumes.add(resume_id)
+        self.tasks.put((RESUME_TASK, resume_id))
+        self.stats['resumes_queued'] += 1
+        logger.info(f"Queued resume {resume_id} for processing")
+
+    def enqueue_job_refresh(self):
+        # Collapse bursts of job edits into a single re-embedding pass
+        if self._jobs_refresh_pending.is_set():
+            return
+        self._jobs_refresh_pending.set()
+        self.tasks.put((JOBS_TASK, None))
+
+    def catch_up(self):
+        """Queue resumes that were already pending before the watcher started"""
+        for resume in db_manager.get_pending_resumes(limit=0):
+            self.enqueue_resume(str(resume['_id']))
+
+    # Change stream handlers
+    def handle_resume_change(self, change: Dict[str, Any]):
+        if change.get('operationType') == 'update':
+            description = change.get('updateDescription') or {}
+            # Only a status reset re-queues a resume; the engine's own writes
+            # (file hash, parsed sections) leave it pending and must not
+            if 'status' not in (description.get('updatedFields') or {}):
+                return
+
+        document = change.get('fullDocument') or {}
+        if document.get('status') == 'pending':
+            resume_id = str(change['documentKey']['_id'])
+            db_manager.invalidate_cache(config.RESUMES_COLLECTION, resume_id)
+            self.enqueue_resume(resume_id)
+
+    def handle_job_change(self, change: Dict[str, Any]):
+        job_id = str(change['documentKey']['_id'])
+        operation = change.get('operationType')
+
+        if operation == 'delete':
+            db_manager.invalidate_cache(config.JOBS_COLLECTION, job_id)
+            db_manager.delete_job_matches(job_id)
+            return
+
+        if operation == 'update':
+            description = change.get('updateDescription') or {}
+            changed_fields = set(description.get('updatedFields') or {})
+            changed_fields.update(description.get('removedFields') or [])
+            # Ignore the engine's own embedding writes
+            if changed_fields and changed_fields <= config.ENGINE_JOB_FIELDS:
+                return
+
+        db_manager.invalidate_cache(config.JOBS_COLLECTION, job_id)
+        if operation != 'insert':
+            db_manager.mark_job_dirty(job_id)
+            self.stats['jobs_marked_dirty'] += 1
+        self.enqueue_job_refresh()
+
+    # Threads
+    def _watch(self, collection_name: str, pipeline: List[Dict], handler):
+        while not self.stop_event.is_set():
+            try:
+                with db_manager.db[collection_name].watch(
+                        pipeline,
+                        full_document='updateLookup',
+                        max_await_time_ms=self.max_await_ms,
+                        resume_after=self._resume_tokens.get(collection_name)
+                ) as stream:
+                    logger.info(f"Watching change stream on '{collection_name}'")
+                    while not self.stop_event.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        self.stats['events_seen'] += 1
+                        self._resume_tokens[collection_name] = stream.resume_token
+                        try:
+                            handler(change)
+                        except Exception as e:
+                            logger.error(f"Error handling change on '{collection_name}': {e}")
+
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                    logger.error("Change streams require a replica set. For local testing start "
+                                 "mongod with --replSet rs0 and run rs.initiate()")
+                    self.stop_event.set()
+                    return
+                logger.error(f"Change stream on '{collection_name}' failed: {e}")
+                self._resume_tokens.pop(collection_name, None)
+                self.stop_event.wait(config.WATCHER_RETRY_DELAY_SECONDS)
+
+            except PyMongoError as e:
+                logger.warning(f"Change stream on '{collection_name}' interrupted, resuming: {e}")
+                self.stop_event.wait(config.WATCHER_RETRY_DELAY_SECONDS)
+
+    def _work(self):
+        while not self.stop_event.is_set():
+            try:
+                task, payload = self.tasks.get(timeout=self.max_await_ms / 1000)
+            except queue.Empty:
+                continue
+
+            try:
+                if task == RESUME_TASK:
+                    try:
+                        self.pipeline.process_single_resume(payload)
+                    finally:
+                        # Keep the id claimed until processing is done so events
+                        # raised by the pipeline's own writes cannot re-queue it
+                        with self._queued_lock:
+                            self._queued_resumes.discard(payload)
+                elif task == JOBS_TASK:
+                    self._jobs_refresh_pending.clear()
+                    self.pipeline.process_jobs(limit=None)
+            except Exception as e:
+                logger.error(f"Watcher task {task} failed: {e}")
+            finally:
+                self.tasks.task_done()
+
+    def start(self):
+        resume_pipeline = [{
+            "$match": {
+                "operationType": {"$in": ["insert", "update", "replace"]},
+                "fullDocument.status": "pending"
+            }
+        }]
+        job_pipeline = [{
+            "$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}
+        }]
+
+        self._threads = [
+            threading.Thread(target=self._watch, name="watch-resumes", daemon=True,
+                             args=(config.RESUMES_COLLECTION, resume_pipeline, self.handle_resume_change)),
+            threading.Thread(target=self._watch, name="watch-jobs", daemon=True,
+                             args=(config.JOBS_COLLECTION, job_pipeline, self.handle_job_change)),
+            threading.Thread(target=self._work, name="watch-worker", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+        self.catch_up()
+
+    def stop(self, timeout: Optional[float] = None):
+        self.stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        logger.info(f"Watcher stopped: {self.stats}")
+
+    def run_forever(self):
+        logger.info("Starting change stream watcher")
+        self.start()
+        try:
+            while not self.stop_event.is_set():
+                time.sleep(1)
+        finally:
+            self.stop()